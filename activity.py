@@ -14,9 +14,9 @@ def extract_activities(user_filepath, imperial=True, type_filter=None):
     activities = parse_activities_csv(extracted_filepath, imperial, type_filter)
     return activities
 
-def source_input_directory(user_filepath):
+def source_input_directory(user_filepath, extract_filepath=None):
     """Examine program arguments to determine the location of an archive.
-    Extract as needed.
+    Extract as needed, into extract_filepath when given, otherwise next to the archive.
     """
     if user_filepath is None:
         return "export"
@@ -30,7 +30,7 @@ def source_input_directory(user_filepath):
 
     if path.is_file():
         if user_filepath.endswith(".zip"):
-            extracted_filepath = user_filepath.replace(".zip", "")
+            extracted_filepath = extract_filepath or user_filepath.replace(".zip", "")
             with zipfile.ZipFile(user_filepath, 'r') as zip_file:
                 zip_file.extractall(extracted_filepath)
                 return extracted_filepath
@@ -38,6 +38,13 @@ def source_input_directory(user_filepath):
             raise RuntimeError("Specified path {} is a file, but not an archive".format(user_filepath))
 
 
+def output_directory(arguments, name):
+    """Resolve a named output directory (plot, report, cache) under the output root, creating it as needed."""
+    directory = os.path.join(arguments.output, name)
+    pathlib.Path(directory).mkdir(parents=True, exist_ok=True)
+    return directory
+
+
 def parse_activities_csv(extract_filepath, imperial=True, type_filter=None):
     """Ingest extracted activities csv and return a list of parsed acitivty instances."""
     activities = []
@@ -6,9 +6,12 @@ import pandas as pd
 import statistics
 import textwrap
 from activity import Activity, create_activity, parse_activities_csv, extract_activities
+from elevation import prefer_recomputed_elevation, elevation_summary
+from single_plot import load_selected_track
 
 def stats(arguments):
     rides = extract_activities(arguments.input, imperial=True, type_filter="Ride")
+    rides = prefer_recomputed_elevation(arguments, rides)
 
     current_datetime = datetime.datetime.now()
     first_datetime = rides[0].date
@@ -118,3 +121,28 @@ def stats(arguments):
     print("Distances: {} (min) {} (max) {} (avg) miles".format(min_distance, max_distance, average_distance))
     print("Elevation: {} (min) {} (max) {} (avg) feet".format(min_elevation, max_elevation, average_elevation))
     print("Moving Time: {} (min) {} (max) {} (avg) minutes".format(min_time_minutes, max_time_minutes, average_time_minutes))
+
+
+def climbs(arguments):
+    """Print elevation gain, loss and climbs recomputed from the track of a single ride."""
+    track = load_selected_track(arguments)
+    summary = elevation_summary(track, arguments.threshold)
+    if summary is None:
+        print("Selected activity has no elevation data")
+        return
+
+    elevation_gain, elevation_loss, climb_segments = summary
+    print(textwrap.dedent("""\
+    Elevation Gain: {} feet
+    Elevation Loss: {} feet
+    Climbs: {}
+    """.format(round(elevation_gain * 3.28084, 2), round(elevation_loss * 3.28084, 2), len(climb_segments))))
+
+    for start, end, gain in climb_segments:
+        length = end - start
+        print("Mile {} - {}: {} feet over {} miles ({}%)".format(
+            round(start * 0.000621371, 2),
+            round(end * 0.000621371, 2),
+            round(gain * 3.28084, 2),
+            round(length * 0.000621371, 2),
+            round(gain / length * 100, 1) if length else 0))
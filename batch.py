@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import csv
+import time
+import argparse
+import traceback
+import concurrent.futures
+from activity import extract_activities, source_input_directory
+from elevation import prefer_recomputed_elevation
+import crunch
+import report
+
+BATCH_REPORTS = {
+    "report-all": report.generate_aggregate_report,
+    "report": report.generate_single_report
+}
+EXTRACT_DIRECTORY = "export"
+SUMMARY_COLUMNS = ["name", "input", "status", "rides", "time", "distance", "elevation", "seconds", "error"]
+
+def batch(arguments):
+    """Generate reports for many exports at once, each into its own output directory, over a process pool."""
+    exports = discover_exports(arguments.exports)
+    exports.sort(key=lambda export: export_size(export[1]), reverse=True)
+    print("Processing {} exports across {} processes".format(len(exports), arguments.processes or os.cpu_count()))
+
+    tasks = [(name, path, os.path.join(arguments.output, name), arguments.reports, arguments.prefetch, arguments.elevation)
+        for name, path in exports]
+    results = []
+    with concurrent.futures.ProcessPoolExecutor(arguments.processes) as executor:
+        futures = {executor.submit(process_export, task): task for task in tasks}
+        for future in concurrent.futures.as_completed(futures):
+            name, path = futures[future][:2]
+            try:
+                result = future.result()
+            except Exception as exception:
+                result = failed_result(name, path, 0, exception)
+            print("{}: {}".format(name, result["error"] or result["status"]))
+            results.append(result)
+
+    results.sort(key=lambda result: result["name"])
+    os.makedirs(arguments.output, exist_ok=True)
+    summary_filepath = os.path.join(arguments.output, "summary.csv")
+    with open(summary_filepath, "w", newline="") as summary_file:
+        summary_writer = csv.DictWriter(summary_file, fieldnames=SUMMARY_COLUMNS)
+        summary_writer.writeheader()
+        summary_writer.writerows(results)
+
+    failures = [result for result in results if result["status"] != "ok"]
+    print("{} of {} exports processed successfully, summary written to {}".format(
+        len(results) - len(failures), len(results), summary_filepath))
+
+
+def discover_exports(exports_path):
+    """Return (name, path) pairs for each export listed in a manifest, or found within a directory.
+    A manifest lists one export path per line, relative to the manifest, with an optional name after a comma.
+    A directory is expected to contain one extracted export directory or export archive per athlete. A directory
+    sitting next to an archive of the same name is taken to be an extraction of that archive, and skipped.
+    """
+    exports = []
+    if os.path.isdir(exports_path):
+        for entry in sorted(os.scandir(exports_path), key=lambda entry: entry.name):
+            if entry.is_dir() and os.path.exists(os.path.join(entry.path, "activities.csv")):
+                if os.path.isfile(entry.path + ".zip"):
+                    continue
+                exports.append((entry.name, entry.path))
+            elif entry.is_file() and entry.name.endswith(".zip"):
+                exports.append((entry.name[:-len(".zip")], entry.path))
+    else:
+        manifest_directory = os.path.dirname(exports_path)
+        with open(exports_path, "r") as manifest_file:
+            for line in manifest_file:
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                path, _, name = [part.strip() for part in line.partition(",")]
+                path = os.path.join(manifest_directory, path)
+                exports.append((name or os.path.basename(path.rstrip(os.sep)).replace(".zip", ""), path))
+
+    names = [name for name, path in exports]
+    duplicates = set(name for name in names if names.count(name) > 1)
+    if duplicates:
+        raise RuntimeError("Export names must be unique, found duplicates: {}".format(", ".join(sorted(duplicates))))
+    return exports
+
+
+def export_size(path):
+    """Estimate the amount of work in an export from its size on disk."""
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    size = 0
+    for directory, directories, filenames in os.walk(path):
+        for filename in filenames:
+            size += os.path.getsize(os.path.join(directory, filename))
+    return size
+
+
+def process_export(task):
+    """Generate the requested reports for one export. Runs in a worker process, and never raises."""
+    name, path, output, reports, prefetch, elevation = task
+    started = time.time()
+    try:
+        # Extract archives once up front, rather than once per report, into the export's own output directory
+        # so that the exports being discovered are never modified.
+        extract_filepath = source_input_directory(path, os.path.join(output, EXTRACT_DIRECTORY))
+        # Each export gets its own output root, which namespaces its plot, report and cache directories.
+        # Track parsing stays in this process, since the exports themselves are already spread over processes.
+        arguments = argparse.Namespace(input=extract_filepath, output=output, prefetch=prefetch, workers=1,
+            elevation=elevation, date=None, show=False, explain=False)
+        for report_name in reports:
+            BATCH_REPORTS[report_name](arguments)
+
+        rides = extract_activities(extract_filepath, imperial=True, type_filter="Ride")
+        rides = prefer_recomputed_elevation(arguments, rides)
+        total_metrics = crunch.crunch_total_metrics(rides)
+        return {
+            "name": name,
+            "input": path,
+            "status": "ok",
+            "rides": total_metrics[0],
+            "time": round(total_metrics[1], 2),
+            "distance": round(total_metrics[2], 2),
+            "elevation": round(total_metrics[3], 2),
+            "seconds": round(time.time() - started, 2),
+            "error": ""
+        }
+    except Exception as exception:
+        traceback.print_exc()
+        return failed_result(name, path, time.time() - started, exception)
+
+
+def failed_result(name, path, seconds, exception):
+    return {
+        "name": name,
+        "input": path,
+        "status": "failed",
+        "rides": "",
+        "time": "",
+        "distance": "",
+        "elevation": "",
+        "seconds": round(seconds, 2),
+        "error": "{}: {}".format(type(exception).__name__, exception)
+    }
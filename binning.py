@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import pandas as pd
+
+BINNING_METHODS = ["fixed", "quantile"]
+
+def bin_edges(values, bins, method="fixed"):
+    """Compute bin edges for the given values.
+    Fixed bins are evenly spaced over the range of the values, quantile bins hold roughly equal counts.
+    Duplicate quantile edges are collapsed, so fewer bins than requested may be returned.
+    """
+    if bins < 1:
+        raise ValueError("Number of bins must be at least 1, got {}".format(bins))
+    values = np.asarray(values, dtype=float)
+    if len(values) == 0:
+        return np.array([0.0, 1.0])
+
+    if method == "fixed":
+        edges = np.histogram_bin_edges(values, bins=bins)
+    elif method == "quantile":
+        edges = np.unique(np.quantile(values, np.linspace(0, 1, bins + 1)))
+    else:
+        raise ValueError("Unknown binning method {}, expected one of {}".format(method, BINNING_METHODS))
+
+    if len(edges) < 2:
+        edges = np.array([values[0] - 0.5, values[0] + 0.5])
+    return edges
+
+
+def bin_indices(values, edges):
+    """Return the bin index of each value, with values on the outer edges folded into the end bins."""
+    indices = np.searchsorted(edges, np.asarray(values, dtype=float), side="right") - 1
+    return np.clip(indices, 0, len(edges) - 2)
+
+
+def bin_labels(edges, precision=0):
+    """Format a readable "low-high" label for each bin."""
+    return ["{:.{p}f}-{:.{p}f}".format(low, high, p=precision) for low, high in zip(edges[:-1], edges[1:])]
+
+
+def binned_statistics(x, y, values, x_bins=8, y_bins=8, method="fixed", precision=0):
+    """Bin observations on two axes and aggregate the mean value and count of each cell in one pass.
+    Returns a (means, counts) pair of dataframes, indexed by y bin and with a column per x bin.
+    Cells with no observations have a NaN mean and a zero count.
+    """
+    x_edges = bin_edges(x, x_bins, method)
+    y_edges = bin_edges(y, y_bins, method)
+    column_count = len(x_edges) - 1
+    row_count = len(y_edges) - 1
+
+    cell_indices = bin_indices(y, y_edges) * column_count + bin_indices(x, x_edges)
+    counts = np.bincount(cell_indices, minlength=row_count * column_count)
+    sums = np.bincount(cell_indices, weights=np.asarray(values, dtype=float), minlength=row_count * column_count)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = np.where(counts > 0, sums / counts, np.nan)
+
+    index = pd.Index(bin_labels(y_edges, precision))
+    columns = pd.Index(bin_labels(x_edges, precision))
+    means_df = pd.DataFrame(means.reshape(row_count, column_count), index=index, columns=columns)
+    counts_df = pd.DataFrame(counts.reshape(row_count, column_count), index=index, columns=columns)
+    return means_df, counts_df
@@ -0,0 +1,173 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import json
+import hashlib
+import inspect
+import numpy as np
+import pandas as pd
+from activity import output_directory
+from track_cache import CACHE_DIRECTORY
+
+BUILD_MANIFEST_FILENAME = "build-manifest.json"
+
+class BuildGraph:
+    """Tracks the nodes a report is built from, so a rebuild only recomputes what changed since the last build.
+    Every node is fingerprinted by its named inputs, and the fingerprints of the last build are kept in a
+    manifest under the cache directory. Data inputs are recorded for explanation only, value nodes keep their
+    result in the manifest, and output nodes keep theirs in the file they render to, which is only rewritten
+    when its content changed. Nodes not visited by a build keep their previous record.
+    Code is an extra input of every value and output node, standing for whatever they depend on beyond their
+    own inputs, such as the modules their functions call into and the versions of the libraries they use.
+    """
+    def __init__(self, arguments, explain=False, code=None):
+        self.manifest_filepath = os.path.join(output_directory(arguments, CACHE_DIRECTORY), BUILD_MANIFEST_FILENAME)
+        self.explain = explain
+        self.code = fingerprint(code)
+        self.previous = {}
+        if os.path.exists(self.manifest_filepath):
+            with open(self.manifest_filepath, "r") as manifest_file:
+                self.previous = json.load(manifest_file)
+        self.current = {}
+
+
+    def input(self, name, value):
+        """Record a data input, returning its fingerprint for use as the input of other nodes."""
+        digest = fingerprint(value)
+        reason = self.stale_reason(name, {"value": digest})
+        self.current[name] = {"inputs": {"value": digest}}
+        self.report(name, "changed" if reason else "unchanged", reason if reason == "new" else None)
+        return digest
+
+
+    def value(self, name, inputs, compute):
+        """Return the result of a node, recomputing it only if its inputs changed. Results must be json serializable."""
+        fingerprints = self.fingerprints(inputs)
+        reason = self.stale_reason(name, fingerprints)
+        if reason is None and "value" in self.previous[name]:
+            result = self.previous[name]["value"]
+            self.report(name, "reused")
+        else:
+            result = json.loads(json.dumps(compute(), default=plain_value))
+            self.report(name, "rebuilt", reason or "no stored result")
+        self.current[name] = {"inputs": fingerprints, "value": result}
+        return result
+
+
+    def output(self, name, filepath, inputs, render):
+        """Return the text of an output file, rendering it only if its inputs changed or the file is missing.
+        A rendered output is only written if its content differs from the file on disk.
+        """
+        fingerprints = self.fingerprints(inputs)
+        reason = self.stale_reason(name, fingerprints)
+        if reason is None and not os.path.exists(filepath):
+            reason = "output missing"
+
+        if reason is None:
+            with open(filepath, "r") as output_file:
+                content = output_file.read()
+            self.report(name, "reused")
+        else:
+            content = render()
+            written = write_if_changed(filepath, content)
+            self.report(name, "rebuilt", reason if written else reason + ", output unchanged so not written")
+        self.current[name] = {"inputs": fingerprints}
+        return content
+
+
+    def fingerprints(self, inputs):
+        fingerprints = {key: fingerprint(value) for key, value in inputs.items()}
+        fingerprints["code"] = self.code
+        return fingerprints
+
+
+    def stale_reason(self, name, fingerprints):
+        """Return why a node must be rebuilt given its input fingerprints, or None if its last build is current."""
+        record = self.previous.get(name)
+        if record is None:
+            return "new"
+        changed = sorted(key for key in set(fingerprints) | set(record["inputs"])
+            if fingerprints.get(key) != record["inputs"].get(key))
+        if changed:
+            return "changed " + ", ".join(changed)
+        return None
+
+
+    def report(self, name, status, reason=None):
+        if self.explain:
+            print("{:<9} {}{}".format(status, name, " ({})".format(reason) if reason else ""))
+
+
+    def save(self):
+        """Write the manifest of this build, keeping the records of nodes it did not visit."""
+        manifest = dict(self.previous)
+        manifest.update(self.current)
+        temporary_filepath = self.manifest_filepath + ".tmp"
+        with open(temporary_filepath, "w") as manifest_file:
+            json.dump(manifest, manifest_file)
+        os.replace(temporary_filepath, self.manifest_filepath)
+
+
+def fingerprint(value):
+    """Return a stable digest of a value, descending into containers, frames and objects.
+    Functions and modules are fingerprinted by their source, so editing a plot invalidates what it rendered.
+    """
+    digest = hashlib.sha256()
+    update_fingerprint(digest, value)
+    return digest.hexdigest()
+
+
+def update_fingerprint(digest, value):
+    if isinstance(value, pd.DataFrame):
+        digest.update(repr(list(value.columns)).encode("utf-8"))
+        digest.update(pd.util.hash_pandas_object(value).to_numpy().tobytes())
+    elif isinstance(value, pd.Series):
+        digest.update(pd.util.hash_pandas_object(value).to_numpy().tobytes())
+    elif isinstance(value, np.ndarray):
+        digest.update(repr((value.dtype.str, value.shape)).encode("utf-8"))
+        digest.update(np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, dict):
+        digest.update(b"{")
+        for key in sorted(value):
+            update_fingerprint(digest, key)
+            update_fingerprint(digest, value[key])
+        digest.update(b"}")
+    elif isinstance(value, (list, tuple)):
+        digest.update(b"[")
+        for item in value:
+            update_fingerprint(digest, item)
+        digest.update(b"]")
+    elif inspect.isfunction(value) or inspect.ismodule(value):
+        digest.update(inspect.getsource(value).encode("utf-8"))
+    elif hasattr(value, "__dict__"):
+        update_fingerprint(digest, vars(value))
+    else:
+        digest.update(repr(value).encode("utf-8"))
+        digest.update(b"\0")
+
+
+def plain_value(value):
+    """Convert numpy scalars to python values when serializing node results."""
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError("{} is not json serializable".format(type(value).__name__))
+
+
+def write_if_changed(filepath, content):
+    """Write text to a file unless it already holds exactly that text. Returns True if the file was written."""
+    if os.path.exists(filepath):
+        with open(filepath, "r") as existing_file:
+            if existing_file.read() == content:
+                return False
+    with open(filepath, "w") as output_file:
+        output_file.write(content)
+    return True
+
+
+def file_signature(filepath):
+    """Return a cheap signature of a file on disk, or None if it does not exist."""
+    if not os.path.exists(filepath):
+        return None
+    stat = os.stat(filepath)
+    return (stat.st_mtime_ns, stat.st_size)
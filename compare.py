@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import datetime
+import numpy as np
+import pandas as pd
+from crunch import select_activity
+from elevation import smoothed_elevation
+from routes import RouteIndex, load_geometries, format_elapsed
+from track import parse_track
+from track_reader import open_track_source, read_tracks
+
+COMPARE_AXES = ["distance", "time"]
+GRID_SPACINGS = {"distance": 10, "time": 5} # meters or seconds between points of the shared grid
+SPEED_WINDOW = 9 # grid points per rolling speed average
+
+class Comparison:
+    """Rides re-gridded onto a shared distance or elapsed time axis, the first ride being the reference.
+    Each series is a (rides, grid points) array, holding NaN past the end of each ride. Speed is in mph and
+    elevation in feet. On the distance axis the gap is seconds behind the reference, and on the time axis
+    it is miles ahead of the reference.
+    """
+    def __init__(self, rides, axis, grid, speed, elevation, gap):
+        self.rides = rides
+        self.axis = axis
+        self.grid = grid
+        self.speed = speed
+        self.elevation = elevation
+        self.gap = gap
+
+
+def select_rides(arguments, rides):
+    """Select the rides to compare, reference ride first.
+    These are the rides on each of the given dates, or else the ride on the given date (by default the most
+    recent) followed by the most recent other rides along the same route.
+    """
+    if arguments.dates:
+        return select_dated_rides(rides, arguments.dates)
+
+    if arguments.date:
+        reference = select_dated_rides(rides, [arguments.date])[0]
+    elif rides:
+        reference = select_activity(rides)
+    else:
+        raise RuntimeError("No rides found to compare")
+    route_index = RouteIndex(load_geometries(arguments, rides))
+    if reference.activity_id not in route_index.geometries:
+        return [reference]
+    same_route_ids = {other_id for other_id in route_index.route_candidates(reference.activity_id)
+        if route_index.same_route(reference.activity_id, other_id)}
+    others = [ride for ride in rides if ride.activity_id in same_route_ids]
+    return [reference] + others[-arguments.limit:]
+
+
+def select_dated_rides(rides, iso_dates):
+    """Select the first ride on each of the given dates.
+    Unlike single ride selection there is no fallback to the most recent ride, so a date without a ride, or
+    a ride selected more than once, is an error.
+    """
+    selected_rides = []
+    for iso_date in iso_dates:
+        desired_date = datetime.datetime.fromisoformat(iso_date).date()
+        ride = next((ride for ride in rides if ride.date.date() == desired_date), None)
+        if ride is None:
+            raise RuntimeError("No ride found on {}".format(iso_date))
+        if ride in selected_rides:
+            raise RuntimeError("The ride on {} is selected more than once".format(iso_date))
+        print("Selected activity \"{}\" on {}".format(ride.name, ride.date))
+        selected_rides.append(ride)
+    return selected_rides
+
+
+def load_tracks(arguments, rides):
+    """Read and parse the tracks of the given rides, returning the rides with usable tracks and their tracks.
+    Other rides without a usable track are left out, but the reference ride, being first, must have one.
+    """
+    tracks_by_id = {}
+    source = open_track_source(arguments.input)
+    try:
+        for ride, track in read_tracks(source, rides, parse=parse_track,
+                prefetch=arguments.prefetch, workers=arguments.workers):
+            if len(track) >= 2:
+                tracks_by_id[ride.activity_id] = track
+    finally:
+        source.close()
+    if rides and rides[0].activity_id not in tracks_by_id:
+        raise RuntimeError("Unable to read the track of the reference ride \"{}\" on {}".format(
+            rides[0].name, rides[0].date))
+    loaded_rides = [ride for ride in rides if ride.activity_id in tracks_by_id]
+    return loaded_rides, [tracks_by_id[ride.activity_id] for ride in loaded_rides]
+
+
+def align_tracks(rides, tracks, axis="distance"):
+    """Re-grid the tracks of rides onto one grid shared by all of them, spaced by the axis' grid spacing."""
+    spacing = GRID_SPACINGS[axis]
+    positions = [track.distance if axis == "distance" else track.seconds for track in tracks]
+    grid = np.arange(0, max(position[-1] for position in positions) + spacing, spacing)
+
+    elevation = interpolate_batch(positions, [smoothed_elevation(track) for track in tracks], grid)
+    if axis == "distance":
+        seconds = interpolate_batch(positions, [track.seconds for track in tracks], grid)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            speed = 1 / np.gradient(seconds, spacing, axis=1)
+        speed[~np.isfinite(speed)] = np.nan
+        gap = seconds - seconds[0]
+        past_end = np.isnan(seconds)
+    else:
+        distance = interpolate_batch(positions, [track.distance for track in tracks], grid)
+        speed = np.gradient(distance, spacing, axis=1)
+        gap = (distance - distance[0]) * 0.000621371 # convert meters to miles
+        past_end = np.isnan(distance)
+
+    speed = pd.DataFrame(speed.T).rolling(window=SPEED_WINDOW, center=True, min_periods=1).mean().to_numpy().T
+    speed[past_end] = np.nan
+    return Comparison(rides, axis, grid, speed * 2.23694, elevation * 3.28084, gap)
+
+
+def interpolate_batch(positions, values, grid):
+    """Interpolate the values of many tracks onto a shared grid with a single np.interp call.
+    Tracks are laid end to end by offsetting the positions of each past the end of the one before, which
+    keeps the combined positions increasing. Grid points past the end of a track are NaN.
+    """
+    ends = np.array([position[-1] for position in positions])
+    span = max(ends.max(), grid[-1]) + 1
+    offsets = np.arange(len(positions)) * span
+    combined_positions = np.concatenate([position + offset for position, offset in zip(positions, offsets)])
+    combined_grid = (grid[np.newaxis, :] + offsets[:, np.newaxis]).ravel()
+    interpolated = np.interp(combined_grid, combined_positions, np.concatenate(values)).reshape(len(positions), len(grid))
+    interpolated[grid[np.newaxis, :] > ends[:, np.newaxis]] = np.nan
+    return interpolated
+
+
+def ride_label(ride):
+    return ride.date.strftime("%b %d %Y %H:%M")
+
+
+def print_comparison(comparison):
+    """Print where each ride stood relative to the reference at the end of the shortest ride."""
+    common = np.flatnonzero(~np.isnan(comparison.gap).any(axis=0))[-1]
+    if comparison.axis == "distance":
+        print("Gap to the reference ride after {} miles".format(round(comparison.grid[common] * 0.000621371, 2)))
+    else:
+        print("Distance ahead of the reference ride after {}".format(format_elapsed(comparison.grid[common])))
+    for ride, gap in zip(comparison.rides, comparison.gap[:, common]):
+        if comparison.axis == "distance":
+            gap_text = ("+" if gap >= 0 else "-") + format_elapsed(abs(gap))
+        else:
+            gap_text = "{:+.2f} miles".format(gap)
+        print("    {} {} {}".format(ride_label(ride), gap_text, ride.name))
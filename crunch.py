@@ -20,9 +20,7 @@ def select_activity(activities, iso_date=None):
     if iso_date:
         desired_datetime = datetime.datetime.fromisoformat(iso_date)
         for activity in activities:
-            if desired_datetime.year == ride.date.year and \
-                    desired_datetime.month == ride.date.month and \
-                    desired_datetime.day == ride.date.day:
+            if desired_datetime.date() == activity.date.date():
                 selected_activity = activity
                 break
     print("Selected activity \"{}\" on {}".format(selected_activity.name, selected_activity.date))
@@ -31,53 +29,50 @@ def select_activity(activities, iso_date=None):
 
 def crunch_total_metrics(rides):
     """Given activities, calculate and return several all time aggregations."""
-    total_distance = 0
-    total_elevation = 0
-    total_time = 0
+    return reduce_total_metrics([crunch_partial_metrics(rides)])
 
+
+def crunch_partial_metrics(rides):
+    """Given the activities of one period, calculate sums which combine with the sums of other periods.
+    Weekly sums are keyed by the sunday ending each week, matching pandas' weekly grouping.
+    """
+    weeks = {}
     for ride in rides:
-        total_distance += ride.distance
-        total_elevation += ride.elevation_gain
-        total_time += ride.moving_time
+        week_end = (ride.date + datetime.timedelta(days=6 - ride.date.weekday())).date().isoformat()
+        week = weeks.setdefault(week_end, [0, 0, 0, 0])
+        week[0] += 1
+        week[1] += ride.moving_time / 60
+        week[2] += ride.distance
+        week[3] += ride.elevation_gain
 
-    return (len(rides), total_time / 3600, total_distance, total_elevation)
+    return {
+        "rides": len(rides),
+        "time": sum(ride.moving_time for ride in rides),
+        "distance": sum(ride.distance for ride in rides),
+        "elevation": sum(ride.elevation_gain for ride in rides),
+        "weeks": weeks
+    }
 
 
-def crunch_year_to_date_metrics(rides):
-    """Given activities, calculate and return several year to date aggregations."""
-    current_datetime = datetime.datetime.now()
-    ytd_rides = 0
-    ytd_distance = 0
-    ytd_elevation = 0
-    ytd_time = 0
+def reduce_total_metrics(partials):
+    """Combine partial sums into the ride count, moving hours, distance and elevation gain of all their rides."""
+    partials = list(partials)
+    return (sum(partial["rides"] for partial in partials), sum(partial["time"] for partial in partials) / 3600,
+        sum(partial["distance"] for partial in partials), sum(partial["elevation"] for partial in partials))
 
-    for ride in rides:
-        if ride.date.year == current_datetime.year:
-            ytd_rides += 1
-            ytd_distance += ride.distance
-            ytd_elevation += ride.elevation_gain
-            ytd_time += ride.moving_time
-
-    return (ytd_rides, ytd_time / 3600, ytd_distance, ytd_elevation)
 
+def reduce_weekly_metrics(partials):
+    """Combine partial sums into the average rides, moving minutes, distance and elevation gain per week.
+    Weeks without rides between the first and last week ridden count towards the averages.
+    """
+    weeks = {}
+    for partial in partials:
+        for week_end, sums in partial["weeks"].items():
+            weeks[week_end] = [total + value for total, value in zip(weeks.get(week_end, [0, 0, 0, 0]), sums)]
+    if not weeks:
+        return (0, 0, 0, 0)
 
-def crunch_weekly_metrics(rides):
-    """Given activities, calculate and return several week-based averages."""
-    ride_names = [ride.name for ride in rides]
-    ride_dates = [ride.date for ride in rides]
-    ride_moving_times = [ride.moving_time for ride in rides]
-    ride_distances = [ride.distance for ride in rides]
-    ride_elevations = [ride.elevation_gain for ride in rides]
-    date_df = pd.DataFrame(data={
-        "name": ride_names,
-        "date": ride_dates,
-        "moving_time": ride_moving_times,
-        "distance": ride_distances,
-        "elevation": ride_elevations
-    })
-    rides_by_week = date_df.groupby(pd.Grouper(key="date", freq="W"))
-    average_rides_per_week = statistics.mean([len(weekly_rides[1]) for weekly_rides in rides_by_week])
-    average_time_per_week = statistics.mean([sum(weekly_rides[1]["moving_time"] / 60) for weekly_rides in rides_by_week])
-    average_distance_per_week = statistics.mean([sum(weekly_rides[1]["distance"]) for weekly_rides in rides_by_week])
-    average_elevation_per_week = statistics.mean([sum(weekly_rides[1]["elevation"]) for weekly_rides in rides_by_week])
-    return (average_rides_per_week, average_time_per_week, average_distance_per_week, average_elevation_per_week)
+    first_week = datetime.date.fromisoformat(min(weeks))
+    last_week = datetime.date.fromisoformat(max(weeks))
+    week_count = (last_week - first_week).days // 7 + 1
+    return tuple(sum(sums[index] for sums in weeks.values()) / week_count for index in range(4))
@@ -9,9 +9,27 @@ import baseline
 import single_plot
 import multi_plot
 import transform
+import binning
+import efforts
+import routes
+import compare
+import elevation
 import report
+import server
+import batch
 import locale
 
+def positive_int(value):
+    """Parse a command line argument which must be a whole number of at least one."""
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError("invalid int value: '{}'".format(value))
+    if number < 1:
+        raise argparse.ArgumentTypeError("must be at least 1, got {}".format(number))
+    return number
+
+
 def main():
     locale.setlocale(locale.LC_ALL, '')
     parser = argparse.ArgumentParser(description=textwrap.dedent(
@@ -21,6 +39,15 @@ def main():
         """))
     parser.add_argument("-input",
         help="Specify the location of the desired extract directory, or archive")
+    parser.add_argument("-output", default=".",
+        help="Specify the directory under which plot, report and cache directories are written (default: .)")
+    parser.add_argument("-prefetch", type=positive_int, default=8,
+        help="Number of track files to read ahead of parsing for commands spanning many activities (default: 8)")
+    parser.add_argument("-workers", type=positive_int, default=None,
+        help="Number of processes used to parse track files for commands spanning many activities (default: cpu count)")
+    parser.add_argument("-elevation", choices=elevation.ELEVATION_SOURCES, default="export",
+        help="Use elevation gain from the export, recompute it from tracks where the export lacks it (fill), "
+            "or always prefer the recomputed value (track) (default: export)")
     subparsers = parser.add_subparsers(title="reports",
         description="available reports",
         help="")
@@ -35,12 +62,34 @@ def main():
     report_one_command = subparsers.add_parser("report",
         help="Generate a report for a single activity")
     report_one_command.add_argument("--date", help="seach and report activities on this date (yyyy-mm-dd)")
+    report_one_command.add_argument("--explain", action="store_true",
+        help="print which parts of the report were rebuilt or reused, and why")
     report_one_command.set_defaults(func=report.generate_single_report)
 
     report_all_command = subparsers.add_parser("report-all",
         help="Generate a report of aggregated activity metrics")
+    report_all_command.add_argument("--explain", action="store_true",
+        help="print which parts of the report were rebuilt or reused, and why")
     report_all_command.set_defaults(func=report.generate_aggregate_report)
 
+    serve_command = subparsers.add_parser("serve",
+        help="Serve reports over http from memory, reloading when the export changes")
+    serve_command.add_argument("--host", default="127.0.0.1", help="address to listen on (default: 127.0.0.1)")
+    serve_command.add_argument("--port", type=int, default=8000, help="port to listen on (default: 8000)")
+    serve_command.add_argument("--interval", type=float, default=5.0,
+        help="seconds between checks of the export for changes (default: 5)")
+    serve_command.set_defaults(func=server.serve)
+
+    batch_command = subparsers.add_parser("batch",
+        help="Generate reports for many exports concurrently, each into its own directory under -output")
+    batch_command.add_argument("exports",
+        help="directory containing one export (directory or archive) per athlete, or a manifest listing export paths")
+    batch_command.add_argument("--reports", nargs="+", choices=list(batch.BATCH_REPORTS), default=["report-all"],
+        help="reports to generate for each export (default: report-all)")
+    batch_command.add_argument("--processes", type=positive_int, default=None,
+        help="number of exports to process at once (default: cpu count)")
+    batch_command.set_defaults(func=batch.batch)
+
     ### Single Activity Plots ###
     elevation_command = subparsers.add_parser("elevation",
         help="Plot elevation as a function of time for a single ride (area)")
@@ -60,6 +109,14 @@ def main():
     latlong_command.add_argument("--show", action="store_true", help="use matplotlib to display plot")
     latlong_command.set_defaults(func=single_plot.latlong)
 
+    climbs_command = subparsers.add_parser("climbs",
+        help="Print elevation gain, loss and climbs recomputed from the track of a single ride")
+    climbs_command.add_argument("--date", help="search and report activities on this date (yyyy-mm-dd)")
+    climbs_command.add_argument("--threshold", type=float, default=elevation.HYSTERESIS_THRESHOLD,
+        help="meters an elevation change must exceed to count as a climb or descent (default: {})".format(
+            elevation.HYSTERESIS_THRESHOLD))
+    climbs_command.set_defaults(func=baseline.climbs)
+
     ### Aggregated Activity Plots ###
     dot_command = subparsers.add_parser("dot",
         help="Plot distance as a function of moving time (scatter)")
@@ -74,6 +131,9 @@ def main():
     ets_command = subparsers.add_parser("ets",
         help="Plot relationship between elevation, moving time, and speed (heatmap)")
     ets_command.add_argument("--show", action="store_true", help="use matplotlib to display plot")
+    ets_command.add_argument("--bins", type=positive_int, default=8, help="number of bins on each axis (default: 8)")
+    ets_command.add_argument("--binning", choices=binning.BINNING_METHODS, default="fixed",
+        help="evenly spaced bins, or bins holding roughly equal numbers of rides (default: fixed)")
     ets_command.set_defaults(func=multi_plot.elevation_time_speed)
 
     ride_command = subparsers.add_parser("heatmap",
@@ -96,6 +156,47 @@ def main():
     moving_time_histogram_command.add_argument("--show", action="store_true", help="use matplotlib to display plot")
     moving_time_histogram_command.set_defaults(func=multi_plot.moving_time_histogram)
 
+    efforts_command = subparsers.add_parser("efforts",
+        help="Plot best average efforts over 30s to 60m, all time and for the most recent ride (line)")
+    efforts_command.add_argument("--metric", choices=list(efforts.EFFORT_METRIC_LABELS), default="speed",
+        help="metric to plot best efforts for (default: speed)")
+    efforts_command.add_argument("--show", action="store_true", help="use matplotlib to display plot")
+    efforts_command.set_defaults(func=multi_plot.best_effort_curve)
+
+    load_command = subparsers.add_parser("load",
+        help="Plot fitness, fatigue and form from exponentially weighted training load (line)")
+    load_command.add_argument("--days", type=positive_int, default=365, help="number of most recent days to plot (default: 365)")
+    load_command.add_argument("--show", action="store_true", help="use matplotlib to display plot")
+    load_command.set_defaults(func=multi_plot.training_load_over_time)
+
+    routes_command = subparsers.add_parser("routes",
+        help="List groups of rides which follow the same route")
+    routes_command.add_argument("--min-rides", type=int, default=2,
+        help="only list routes ridden at least this many times (default: 2)")
+    routes_command.set_defaults(func=routes.route_clusters)
+
+    segment_command = subparsers.add_parser("segment",
+        help="Rank the fastest efforts between two points across all rides")
+    segment_command.add_argument("--start", required=True, help="segment start as latitude,longitude")
+    segment_command.add_argument("--end", required=True, help="segment end as latitude,longitude")
+    segment_command.add_argument("--radius", type=float, default=25,
+        help="distance in meters a ride must pass within the start and end points (default: 25)")
+    segment_command.add_argument("--limit", type=int, default=10, help="number of efforts to list (default: 10)")
+    segment_command.set_defaults(func=routes.segment_leaderboard)
+
+    compare_command = subparsers.add_parser("compare",
+        help="Overlay speed, elevation and the gap to a reference ride for several rides (line)")
+    compare_command.add_argument("--dates", nargs="+",
+        help="compare the rides on these dates (yyyy-mm-dd), the first being the reference")
+    compare_command.add_argument("--date",
+        help="without --dates, compare the ride on this date (yyyy-mm-dd) with other rides of its route")
+    compare_command.add_argument("--limit", type=int, default=20,
+        help="number of most recent rides of the same route to compare with (default: 20)")
+    compare_command.add_argument("--axis", choices=compare.COMPARE_AXES, default="distance",
+        help="align rides on distance or on elapsed time (default: distance)")
+    compare_command.add_argument("--show", action="store_true", help="use matplotlib to display plot")
+    compare_command.set_defaults(func=multi_plot.compare)
+
     ### Transform ###
     dump_command = subparsers.add_parser("dump",
         help="Applies a specified transform to the activities file, for readability or compatibility with another system")
@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import pandas as pd
+from track import parse_track
+from track_cache import load_track_table
+
+EFFORT_WINDOWS = [30, 60, 300, 1200, 3600]
+EFFORT_COLUMNS = ["activity_id", "date", "metric", "window", "value"]
+EFFORT_METRIC_LABELS = {
+    "speed": "Speed (mph)",
+    "heart_rate": "Heart Rate (bpm)",
+    "power": "Power (watts)"
+}
+EFFORT_CACHE_FILENAME = "efforts.csv"
+EFFORT_CACHE_VERSION = 1 # bump whenever best efforts are derived differently
+
+def resample_track(track):
+    """Resample an activity track onto a uniform one second grid of elapsed time.
+    Returns the cumulative distance in meters at each second, and heart rate / power where present,
+    or None if the track has fewer than two points.
+    """
+    if len(track) < 2:
+        return None
+    seconds = track.seconds
+    increasing = np.concatenate([[True], np.diff(seconds) > 0])
+    seconds = seconds[increasing]
+    grid = np.arange(0, seconds[-1] + 1, 1.0)
+
+    resampled = {"distance": np.interp(grid, seconds, track.distance[increasing])}
+    for metric, values in [("heart_rate", track.heart_rate), ("power", track.power)]:
+        values = values[increasing]
+        present = ~np.isnan(values)
+        if present.any():
+            resampled[metric] = np.interp(grid, seconds[present], values[present])
+    return resampled
+
+
+def best_efforts(track, windows=EFFORT_WINDOWS):
+    """Compute the best average speed (mph), heart rate and power over each window size, in seconds.
+    A single cumulative sum per metric serves every window. Windows longer than the track are omitted.
+    """
+    resampled = resample_track(track)
+    if resampled is None:
+        return []
+
+    cumulative_sums = {"speed": resampled["distance"] * 2.23694}
+    for metric in ["heart_rate", "power"]:
+        if metric in resampled:
+            cumulative_sums[metric] = np.concatenate([[0.0], np.cumsum(resampled[metric])])
+
+    efforts = []
+    for metric, cumulative_sum in cumulative_sums.items():
+        for window in windows:
+            if len(cumulative_sum) <= window:
+                continue
+            best = np.max(cumulative_sum[window:] - cumulative_sum[:-window]) / window
+            efforts.append((metric, window, best))
+    return efforts
+
+
+def parse_best_efforts(data):
+    """Parse raw track bytes straight to best efforts, so track reader workers only hand back a few numbers."""
+    return best_efforts(parse_track(data))
+
+
+def load_effort_table(arguments, rides):
+    """Return the best efforts of every ride, one row per ride, metric and window.
+    Efforts are cached per activity, so only rides not seen by a previous run have their tracks read.
+    """
+    return load_track_table(arguments, rides, EFFORT_CACHE_FILENAME, EFFORT_COLUMNS, parse_best_efforts,
+        effort_rows, EFFORT_CACHE_VERSION, parse_dates=["date"])
+
+
+def effort_rows(ride, efforts):
+    return [(ride.activity_id, ride.date, metric, window, value) for metric, window, value in efforts]
+
+
+def all_time_bests(effort_table):
+    """Reduce per ride efforts to the all time best for each metric and window, along with the ride that set it."""
+    if effort_table.empty:
+        return pd.DataFrame(columns=EFFORT_COLUMNS)
+    effort_table = effort_table.astype({"value": float})
+    best_indices = effort_table.groupby(["metric", "window"]).value.idxmax()
+    return effort_table.loc[best_indices].sort_values(["metric", "window"]).reset_index(drop=True)
+
+
+def best_effort_values(effort_table):
+    """Reduce per ride efforts to [metric, window, value] rows holding the best value of each metric and window."""
+    bests = all_time_bests(effort_table)
+    return [[metric, int(window), float(value)] for metric, window, value in zip(bests.metric, bests.window, bests.value)]
+
+
+def merge_best_effort_values(partials):
+    """Merge the best effort values of several sets of rides, such as each year's, into their overall bests."""
+    bests = {}
+    for rows in partials:
+        for metric, window, value in rows:
+            if (metric, window) not in bests or value > bests[(metric, window)]:
+                bests[(metric, window)] = value
+    return [[metric, window, value] for (metric, window), value in sorted(bests.items())]
+
+
+def format_window(seconds):
+    if seconds < 60:
+        return "{}s".format(seconds)
+    return "{}m".format(seconds // 60)
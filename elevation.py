@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import pandas as pd
+from track import parse_track
+from track_cache import load_track_table
+
+SMOOTHING_SPACING = 10 # meters between resampled elevation points
+SMOOTHING_WINDOW = 9 # resampled points per rolling average, so roughly 90 meters
+HYSTERESIS_THRESHOLD = 4 # meters an elevation change must exceed to count as a climb or descent
+ELEVATION_COLUMNS = ["activity_id", "elevation_gain", "elevation_loss", "climb_count"]
+ELEVATION_CACHE_FILENAME = "elevation.csv"
+ELEVATION_CACHE_VERSION = 1 # bump when the smoothing or hysteresis changes
+ELEVATION_SOURCES = ["export", "fill", "track"]
+
+def smooth_elevation_profile(track):
+    """Resample elevation onto a uniform distance grid and smooth it with a centered rolling average.
+    Resampling by distance rather than by trackpoint keeps stops and recording rate from weighting the smoothing.
+    Returns (distances, elevations) in meters, or None if the track has no elevation data.
+    """
+    present = ~np.isnan(track.elevation)
+    if present.sum() < 2:
+        return None
+    distances = track.distance[present]
+    grid = np.append(np.arange(0, distances[-1], SMOOTHING_SPACING), distances[-1])
+    resampled = np.interp(grid, distances, track.elevation[present])
+    smoothed = pd.Series(resampled).rolling(window=SMOOTHING_WINDOW, center=True, min_periods=1).mean().to_numpy()
+    return grid, smoothed
+
+
+def smoothed_elevation(track):
+    """Smoothed elevation in meters at each trackpoint, memoized on the track."""
+    def derive():
+        profile = smooth_elevation_profile(track)
+        if profile is None:
+            return track.elevation
+        return np.interp(track.distance, profile[0], profile[1])
+    return track.memoize("smoothed_elevation", derive)
+
+
+def hysteresis_pivots(values, threshold=HYSTERESIS_THRESHOLD):
+    """Return the indices of the turning points between climbs and descents larger than the threshold.
+    Only local extrema can be turning points, so those are found vectorized and the hysteresis itself
+    only walks the extrema.
+    """
+    if len(values) < 2:
+        return np.zeros(0, dtype=int)
+    slopes = np.sign(np.diff(values))
+    nonzero = np.flatnonzero(slopes)
+    turns = nonzero[1:][slopes[nonzero[1:]] != slopes[nonzero[:-1]]]
+    candidates = np.unique(np.concatenate([[0], turns, [len(values) - 1]]))
+    candidate_values = values[candidates]
+
+    pivots = []
+    low = high = 0
+    direction = 0
+    for index in range(1, len(candidates)):
+        value = candidate_values[index]
+        if direction == 0:
+            if value < candidate_values[low]:
+                low = index
+            if value > candidate_values[high]:
+                high = index
+            if value - candidate_values[low] >= threshold:
+                pivots.append(low)
+                direction = 1
+                high = index
+            elif candidate_values[high] - value >= threshold:
+                pivots.append(high)
+                direction = -1
+                low = index
+        elif direction == 1:
+            if value > candidate_values[high]:
+                high = index
+            elif candidate_values[high] - value >= threshold:
+                pivots.append(high)
+                direction = -1
+                low = index
+        else:
+            if value < candidate_values[low]:
+                low = index
+            elif value - candidate_values[low] >= threshold:
+                pivots.append(low)
+                direction = 1
+                high = index
+    if direction == 1:
+        pivots.append(high)
+    elif direction == -1:
+        pivots.append(low)
+    return candidates[pivots]
+
+
+def elevation_summary(track, threshold=HYSTERESIS_THRESHOLD):
+    """Recompute elevation gain and loss in meters, and the climbs of a track, from its trackpoints.
+    Each climb is a (start distance, end distance, gain) tuple in meters.
+    """
+    profile = smooth_elevation_profile(track)
+    if profile is None:
+        return None
+    distances, elevations = profile
+    pivots = hysteresis_pivots(elevations, threshold)
+    swings = np.diff(elevations[pivots])
+    climbs = [(distances[start], distances[end], swing)
+        for start, end, swing in zip(pivots[:-1], pivots[1:], swings) if swing > 0]
+    return (swings[swings > 0].sum(), -swings[swings < 0].sum(), climbs)
+
+
+def parse_elevation_summary(data):
+    """Parse raw track bytes straight to an elevation summary, for use as a track reader parse function."""
+    return elevation_summary(parse_track(data))
+
+
+def elevation_rows(ride, summary):
+    if summary is None:
+        return []
+    elevation_gain, elevation_loss, climbs = summary
+    return [(ride.activity_id, elevation_gain, elevation_loss, len(climbs))]
+
+
+def load_elevation_table(arguments, activities):
+    """Return recomputed elevation gain and loss, in meters, for every activity with a track, cached per activity."""
+    return load_track_table(arguments, activities, ELEVATION_CACHE_FILENAME, ELEVATION_COLUMNS,
+        parse_elevation_summary, elevation_rows, ELEVATION_CACHE_VERSION)
+
+
+def prefer_recomputed_elevation(arguments, activities):
+    """Replace the exported elevation gain of activities with the recomputed one, as selected by -elevation.
+    With "fill" only activities missing an exported elevation gain are replaced, with "track" all are.
+    Assumes activities have been converted to imperial units.
+    """
+    if arguments.elevation == "export":
+        return activities
+    candidates = activities
+    if arguments.elevation == "fill":
+        candidates = [activity for activity in activities if not activity.elevation_gain]
+
+    elevation_table = load_elevation_table(arguments, candidates)
+    gains_by_id = dict(zip(elevation_table.activity_id, elevation_table.elevation_gain.astype(float)))
+    for activity in candidates:
+        if activity.activity_id in gains_by_id:
+            activity.elevation_gain = gains_by_id[activity.activity_id] * 3.28084 # convert meters to feet
+    return activities
@@ -0,0 +1,34 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import numpy as np
+
+EARTH_RADIUS_METERS = 6371008.8
+
+def haversine(latitudes_a, longitudes_a, latitudes_b, longitudes_b):
+    """Great circle distance in meters between two sets of coordinates, given in degrees."""
+    latitudes_a = np.radians(latitudes_a)
+    latitudes_b = np.radians(latitudes_b)
+    latitude_deltas = latitudes_b - latitudes_a
+    longitude_deltas = np.radians(longitudes_b) - np.radians(longitudes_a)
+    a = np.sin(latitude_deltas / 2) ** 2 + np.cos(latitudes_a) * np.cos(latitudes_b) * np.sin(longitude_deltas / 2) ** 2
+    return 2 * EARTH_RADIUS_METERS * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def step_distances(latitudes, longitudes):
+    """Distance in meters travelled between each consecutive point of a path, with zero for the first point."""
+    latitudes = np.asarray(latitudes, dtype=float)
+    longitudes = np.asarray(longitudes, dtype=float)
+    if len(latitudes) == 0:
+        return np.zeros(0)
+    steps = haversine(latitudes[:-1], longitudes[:-1], latitudes[1:], longitudes[1:])
+    return np.concatenate([[0.0], np.nan_to_num(steps)])
+
+
+def project(latitudes, longitudes, origin_latitude):
+    """Project coordinates in degrees to an (n, 2) array of x/y meters, with an equirectangular projection
+    around the origin latitude. This is accurate enough over the area covered by a ride, or by one athlete's rides.
+    """
+    x = np.radians(np.asarray(longitudes, dtype=float)) * EARTH_RADIUS_METERS * np.cos(np.radians(origin_latitude))
+    y = np.radians(np.asarray(latitudes, dtype=float)) * EARTH_RADIUS_METERS
+    return np.column_stack([x, y])
@@ -9,12 +9,23 @@ import statistics
 import pandas as pd
 import numpy as np
 import seaborn
-import matplotlib.pyplot as plt
 from activity import Activity, create_activity, parse_activities_csv, build_activity_dataframe, extract_activities
+from plotting import styled_figure, save_plot
+from binning import binned_statistics
+from elevation import prefer_recomputed_elevation
+from training_load import load_training_load
+from compare import select_rides, load_tracks, align_tracks, print_comparison, ride_label
+from efforts import load_effort_table, all_time_bests, format_window, EFFORT_WINDOWS, EFFORT_METRIC_LABELS
 
 def heatmap(arguments):
     rides = extract_activities(arguments.input, imperial=True, type_filter="Ride")
+    with styled_figure(show=arguments.show) as figure:
+        draw_heatmap(figure, rides)
+        save_plot(arguments, figure, "heatmap.svg")
 
+
+def draw_heatmap(figure, rides):
+    """Draw a calendar heatmap of daily distances for the current year."""
     current_datetime = datetime.datetime.now()
     rides = [ride for ride in rides if ride.date.year == current_datetime.year]
 
@@ -25,11 +36,9 @@ def heatmap(arguments):
     })
     weekday_pivot = weekday_df.pivot(index="weekday", columns="week_of_year", values="distance")
 
-    plt.clf()
-    seaborn.set_theme()
     palette = seaborn.color_palette("crest", as_cmap=True)
     grid_kws = {"height_ratios": (.9, .05), "hspace": .05}
-    figure, (ax, cbar_ax) = plt.subplots(2, gridspec_kw=grid_kws)
+    ax, cbar_ax = figure.subplots(2, gridspec_kw=grid_kws)
     ax = seaborn.heatmap(weekday_pivot,
         ax=ax,
         cbar_ax=cbar_ax,
@@ -58,18 +67,18 @@ def heatmap(arguments):
             label.set_text(None)
         last_label = rough_month
     ax.set_xticklabels(horizontal_labels, rotation=45, fontsize="x-small")
-    plt.title("Daily Distances, Year to Date")
-
-    pathlib.Path("plot").mkdir(exist_ok=True)
-    plt.savefig(os.path.join("plot", "heatmap.svg"))
-
-    if arguments.show:
-        plt.show()
+    ax.set_title("Daily Distances, Year to Date")
 
 
 def average_distance_over_weekday(arguments):
     rides = extract_activities(arguments.input, imperial=True, type_filter="Ride")
+    with styled_figure(show=arguments.show) as figure:
+        draw_average_distance_over_weekday(figure, rides)
+        save_plot(arguments, figure, "adow.svg")
 
+
+def draw_average_distance_over_weekday(figure, rides):
+    """Draw a bar plot of average ride distance for each day of the week."""
     weekdays_by_index = dict(zip(range(7), calendar.day_name))
     distances_by_index = dict(zip(range(7), [[] for x in range(7)]))
     for activity in rides:
@@ -81,120 +90,215 @@ def average_distance_over_weekday(arguments):
         "weekday": [weekdays_by_index[index] for index, distance in enumerate(average_distances)],
         "distances": average_distances
     })
-    
-    plt.clf()
-    seaborn.set_theme()
-    adow_plot = seaborn.barplot(x="weekday", y="distances", data=adow_df)
-    adow_plot.set(xlabel="Day of Week", ylabel="Average Distance (miles)")
 
-    pathlib.Path("plot").mkdir(exist_ok=True)
-    plt.savefig(os.path.join("plot", "adow.svg"))
-    
-    if arguments.show:
-        plt.show()
+    ax = figure.subplots()
+    adow_plot = seaborn.barplot(x="weekday", y="distances", data=adow_df, ax=ax)
+    adow_plot.set(xlabel="Day of Week", ylabel="Average Distance (miles)")
 
 
 def elevation_time_speed(arguments):
     rides = extract_activities(arguments.input, imperial=True, type_filter="Ride")
-
-    ets_df = pd.DataFrame(data={
-        "elevation": [float(activity.elevation_gain) for activity in rides],
-        "moving_time": [float(activity.moving_time) / 60 for activity in rides],
-        "average_speed": [float(activity.average_speed) * 2.237 if activity.average_speed else 0 for activity in rides]
-    })
-
-    plt.clf()
-    seaborn.set_theme()
-    ets_pivot = pd.pivot_table(ets_df, index="elevation", columns="moving_time", values="average_speed", aggfunc=np.average)
-    f, ax = plt.subplots(figsize=(9, 6))
-    ets_plot = seaborn.heatmap(ets_pivot, annot=True, linewidths=0.5, ax=ax)
-
-    pathlib.Path("plot").mkdir(exist_ok=True)
-    plt.savefig(os.path.join("plot", "ets.svg"))
-    
-    if arguments.show:
-        plt.show()
+    rides = prefer_recomputed_elevation(arguments, rides)
+    with styled_figure(show=arguments.show, figsize=(9, 6)) as figure:
+        draw_elevation_time_speed(figure, rides, bins=arguments.bins, method=arguments.binning)
+        save_plot(arguments, figure, "ets.svg")
+
+
+def draw_elevation_time_speed(figure, rides, bins=8, method="fixed"):
+    """Draw a heatmap of average speed, binned by elevation gain and moving time, annotated with rides per cell.
+    Binning bounds the heatmap to bins x bins cells regardless of the number of rides.
+    """
+    ets_means, ets_counts = binned_statistics(
+        x=[activity.moving_time / 60 for activity in rides],
+        y=[activity.elevation_gain for activity in rides],
+        values=[activity.average_speed for activity in rides],
+        x_bins=bins,
+        y_bins=bins,
+        method=method)
+
+    ax = figure.subplots()
+    annotations = [["{:.1f}\n{} rides".format(mean, count) if count else ""
+        for mean, count in zip(mean_row, count_row)]
+        for mean_row, count_row in zip(ets_means.to_numpy(), ets_counts.to_numpy())]
+    ets_plot = seaborn.heatmap(ets_means, annot=np.array(annotations), fmt="", annot_kws={"fontsize": "x-small"},
+        linewidths=0.5, ax=ax,
+        cbar_kws={"label": "Average Speed (mph)"})
+    ets_plot.set(xlabel="Moving Time (minutes)", ylabel="Elevation Gain (feet)")
+    ets_plot.invert_yaxis()
 
 
 def average_speed_over_activities(arguments):
     rides = extract_activities(arguments.input, imperial=True, type_filter="Ride")
+    with styled_figure(show=arguments.show) as figure:
+        draw_average_speed_over_activities(figure, rides)
+        save_plot(arguments, figure, "asot.svg")
+
 
+def draw_average_speed_over_activities(figure, rides):
+    """Draw average speed for each ride as a function of ride date."""
     asot_df = pd.DataFrame(data={
         "activity_date": [activity.date for activity in rides],
         "average_speed": [activity.average_speed if activity.average_speed else 0 for activity in rides]
     })
 
-    plt.clf()
-    seaborn.set_theme()
-    asot_plot = seaborn.lineplot(x="activity_date", y="average_speed", data=asot_df)
+    ax = figure.subplots()
+    asot_plot = seaborn.lineplot(x="activity_date", y="average_speed", data=asot_df, ax=ax)
     asot_plot.set(xlabel="Date", ylabel="Average Speed (mph)")
-    plt.fill_between(asot_df.activity_date.values, asot_df.average_speed.values)
-
-    pathlib.Path("plot").mkdir(exist_ok=True)
-    plt.savefig(os.path.join("plot", "asot.svg"))
-    
-    if arguments.show:
-        plt.show()
+    ax.fill_between(asot_df.activity_date.values, asot_df.average_speed.values)
 
 
 def distance_over_time(arguments):
     """Do a basic scatterplot of distance over ride time."""
     rides = extract_activities(arguments.input, imperial=True, type_filter="Ride")
+    with styled_figure(show=arguments.show) as figure:
+        draw_distance_over_time(figure, rides)
+        save_plot(arguments, figure, "dot.svg")
+
 
+def draw_distance_over_time(figure, rides):
+    """Draw a scatterplot of distance over moving time, with a regression fit."""
     dot_by_id = {
         "distance": [ride.distance for ride in rides],
         "moving_time": [ride.moving_time / 60 for ride in rides],
         "average_speed": [ride.average_speed for ride in rides]
     }
 
-    plt.clf()
-    seaborn.set_theme()
     dot_df = pd.DataFrame(data=dot_by_id)
-    dot_plot = seaborn.lmplot(x="moving_time", y="distance", data=dot_df)
+    ax = figure.subplots()
+    dot_plot = seaborn.regplot(x="moving_time", y="distance", data=dot_df, ax=ax)
     dot_plot.set(xlabel="Moving Time (Minutes)", ylabel="Distance (Miles)")
 
-    pathlib.Path("plot").mkdir(exist_ok=True)
-    plt.savefig(os.path.join("plot", "dot.svg"))
-
-    if arguments.show:
-        plt.show()
-
 
 def distance_histogram(arguments):
     rides = extract_activities(arguments.input, imperial=True, type_filter="Ride")
+    with styled_figure(show=arguments.show) as figure:
+        draw_distance_histogram(figure, rides)
+        save_plot(arguments, figure, "dhist.svg")
+
 
+def draw_distance_histogram(figure, rides):
+    """Draw the distribution of ride distances."""
     distance_df = pd.DataFrame(data={
         "distance": [ride.distance for ride in rides]
     })
-    
-    plt.clf()
-    seaborn.set_theme()
-    distance_plot = seaborn.displot(distance_df, x="distance", binwidth=2)
-    distance_plot.set(xlabel="Distance (miles)", ylabel="Count")
-    # plt.title("Distribution of Ride Distances")
 
-    pathlib.Path("plot").mkdir(exist_ok=True)
-    plt.savefig(os.path.join("plot", "dhist.svg"))
-    
-    if arguments.show:
-        plt.show()
+    ax = figure.subplots()
+    distance_plot = seaborn.histplot(distance_df, x="distance", binwidth=2, ax=ax)
+    distance_plot.set(xlabel="Distance (miles)", ylabel="Count")
+    # ax.set_title("Distribution of Ride Distances")
 
 
 def moving_time_histogram(arguments):
     rides = extract_activities(arguments.input, imperial=True, type_filter="Ride")
+    with styled_figure(show=arguments.show) as figure:
+        draw_moving_time_histogram(figure, rides)
+        save_plot(arguments, figure, "thist.svg")
+
 
+def draw_moving_time_histogram(figure, rides):
+    """Draw the distribution of ride moving times."""
     time_df = pd.DataFrame(data={
         "moving_time": [ride.moving_time / 60 for ride in rides]
     })
 
-    plt.clf()
-    seaborn.set_theme()
-    time_plot = seaborn.displot(time_df, x="moving_time", binwidth=15)
+    ax = figure.subplots()
+    time_plot = seaborn.histplot(time_df, x="moving_time", binwidth=15, ax=ax)
     time_plot.set(xlabel="Moving Time (minutes)", ylabel="Count")
-    # plt.title("Distribution of Ride Times")
+    # ax.set_title("Distribution of Ride Times")
+
 
-    pathlib.Path("plot").mkdir(exist_ok=True)
-    plt.savefig(os.path.join("plot", "thist.svg"))
-    
-    if arguments.show:
-        plt.show()
+def best_effort_curve(arguments):
+    rides = extract_activities(arguments.input, imperial=True, type_filter="Ride")
+    effort_table = load_effort_table(arguments, rides)
+    with styled_figure(show=arguments.show) as figure:
+        draw_best_effort_curve(figure, effort_table, arguments.metric)
+        save_plot(arguments, figure, "efforts.svg")
+
+
+def draw_best_effort_curve(figure, effort_table, metric="speed"):
+    """Draw the all time best effort curve for a metric, alongside the curve of the most recent ride."""
+    metric_table = effort_table[effort_table.metric == metric]
+    curve_frames = []
+    if not metric_table.empty:
+        latest_activity_id = metric_table.sort_values("date").activity_id.iloc[-1]
+        curve_frames.append(all_time_bests(metric_table).assign(curve="All Time"))
+        curve_frames.append(metric_table[metric_table.activity_id == latest_activity_id].assign(curve="Most Recent"))
+    curve_df = pd.concat(curve_frames, ignore_index=True) if curve_frames else pd.DataFrame(
+        columns=["window", "value", "curve"])
+    curve_df = curve_df.astype({"window": float, "value": float})
+
+    ax = figure.subplots()
+    curve_plot = seaborn.lineplot(x="window", y="value", hue="curve", data=curve_df, marker="o", ax=ax)
+    curve_plot.set(xlabel="Duration", ylabel=EFFORT_METRIC_LABELS[metric])
+    curve_plot.set_xscale("log")
+    curve_plot.set_xticks(EFFORT_WINDOWS)
+    curve_plot.set_xticklabels([format_window(window) for window in EFFORT_WINDOWS])
+    curve_plot.minorticks_off()
+
+
+def training_load_over_time(arguments):
+    activities = extract_activities(arguments.input, imperial=True, type_filter=None)
+    training = load_training_load(arguments, activities)
+    with styled_figure(show=arguments.show) as figure:
+        draw_training_load(figure, training, arguments.days)
+        save_plot(arguments, figure, "load.svg")
+
+
+def draw_training_load(figure, training, days=365):
+    """Draw fitness, fatigue and form over the most recent days of training load."""
+    training = training.iloc[-days:]
+    load_df = pd.DataFrame(data={
+        "date": training.index,
+        "Fitness": training.fitness.to_numpy(),
+        "Fatigue": training.fatigue.to_numpy(),
+        "Form": training.form.to_numpy()
+    }).melt(id_vars="date", var_name="curve", value_name="value")
+
+    ax = figure.subplots()
+    load_plot = seaborn.lineplot(x="date", y="value", hue="curve", data=load_df, ax=ax)
+    load_plot.set(xlabel="Date", ylabel="Training Load")
+    ax.axhline(0, color="gray", linewidth=0.5)
+
+
+def compare(arguments):
+    rides = extract_activities(arguments.input, imperial=True, type_filter="Ride")
+    compared_rides, tracks = load_tracks(arguments, select_rides(arguments, rides))
+    if not tracks:
+        print("No tracks found for the selected rides")
+        return
+    comparison = align_tracks(compared_rides, tracks, arguments.axis)
+    print_comparison(comparison)
+    with styled_figure(show=arguments.show, figsize=(9, 9)) as figure:
+        draw_comparison(figure, comparison)
+        save_plot(arguments, figure, "compare.svg")
+
+
+def draw_comparison(figure, comparison):
+    """Draw speed, elevation and the gap to the reference ride of each compared ride, overlaid on a shared axis."""
+    if comparison.axis == "distance":
+        grid = comparison.grid * 0.000621371 # convert meters to miles
+        axis_label = "Distance (miles)"
+        gap_label = "Seconds Behind"
+    else:
+        grid = comparison.grid / 60
+        axis_label = "Elapsed Time (minutes)"
+        gap_label = "Miles Ahead"
+
+    labels = [ride_label(ride) for ride in comparison.rides]
+    series_frames = []
+    for name, values in (("speed", comparison.speed), ("elevation", comparison.elevation), ("gap", comparison.gap)):
+        series_frames.append(pd.DataFrame(values.T, columns=labels).assign(grid=grid)
+            .melt(id_vars="grid", var_name="ride", value_name="value").assign(series=name))
+    comparison_df = pd.concat(series_frames, ignore_index=True).dropna(subset=["value"])
+
+    speed_ax, elevation_ax, gap_ax = figure.subplots(3, 1, sharex=True)
+    for ax, name, label in ((speed_ax, "speed", "Speed (miles / hour)"), (elevation_ax, "elevation", "Elevation (feet)"),
+            (gap_ax, "gap", gap_label)):
+        series_plot = seaborn.lineplot(x="grid", y="value", hue="ride", hue_order=labels,
+            data=comparison_df[comparison_df.series == name], estimator=None, linewidth=1,
+            legend="auto" if ax is speed_ax else False, ax=ax)
+        series_plot.set(xlabel=axis_label, ylabel=label)
+    gap_ax.axhline(0, color="gray", linewidth=0.5)
+    if speed_ax.get_legend() is not None:
+        speed_ax.legend(title="", fontsize="small", ncol=2)
+    speed_ax.set_title("Ride Comparison")
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import io
+import os
+import contextlib
+import matplotlib
+import matplotlib.pyplot as plt
+import seaborn
+from cycler import cycler
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from activity import output_directory
+
+PLOT_DIRECTORY = "plot"
+
+def create_template(style, context):
+    """Build the rc parameters seaborn.set_theme would apply, without touching global state."""
+    template = {}
+    template.update(seaborn.axes_style(style))
+    template.update(seaborn.plotting_context(context))
+    template["axes.prop_cycle"] = cycler(color=seaborn.color_palette("deep"))
+    template["svg.hashsalt"] = "cycloanalyzer" # stable element ids, so unchanged plots render identical svg
+    return template
+
+
+FIGURE_TEMPLATES = {
+    "default": create_template("darkgrid", "notebook"),
+    "paper": create_template("white", "paper")
+}
+
+@contextlib.contextmanager
+def styled_figure(template="default", show=False, **figure_kwargs):
+    """Yield a new figure styled from one of the figure templates, and release it on exit.
+    Figures are drawn on their own agg canvas, outside of pyplot's global figure registry, so rendering any
+    number of plots does not accumulate figures. When show is set, the figure is instead created through
+    pyplot so that it can be displayed on exit, after which it is closed.
+    """
+    with matplotlib.rc_context(FIGURE_TEMPLATES[template]):
+        if show:
+            figure = plt.figure(**figure_kwargs)
+        else:
+            figure = Figure(**figure_kwargs)
+            FigureCanvasAgg(figure)
+        try:
+            yield figure
+            if show:
+                plt.show()
+        finally:
+            if show:
+                plt.close(figure)
+            else:
+                figure.clear()
+
+
+def render_plot(draw, *args, template="default", **figure_kwargs):
+    """Draw a plot onto a new figure and return it as svg text, without touching the disk."""
+    with styled_figure(template, **figure_kwargs) as figure:
+        draw(figure, *args)
+        return render_svg(figure)
+
+
+def render_svg(figure):
+    """Render a figure and return it as svg text."""
+    svg_buffer = io.StringIO()
+    figure.savefig(svg_buffer, format="svg", metadata={"Date": None})
+    return svg_buffer.getvalue()
+
+
+def save_plot(arguments, figure, filename):
+    """Save a figure into the plot directory."""
+    figure.savefig(os.path.join(output_directory(arguments, PLOT_DIRECTORY), filename))
+
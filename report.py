@@ -4,46 +4,141 @@
 import os
 import sys
 import re
+import datetime
+import functools
 import calendar
 import statistics
+import numpy as np
 import pandas as pd
-import seaborn
 import pathlib
-import matplotlib.pyplot as plt
+import matplotlib
+import seaborn
+import jinja2
 from xml.etree import ElementTree
 from jinja2 import Environment, PackageLoader, select_autoescape
-from activity import Activity, create_activity, parse_activities_csv, extract_activities
+from activity import Activity, create_activity, parse_activities_csv, extract_activities, source_input_directory, output_directory
+from plotting import render_plot, PLOT_DIRECTORY
+from track import ActivityTrack
+from build_graph import BuildGraph, file_signature
+import activity
+import binning
+import geo
+import plotting
+import track
+import track_reader
 import crunch
+import efforts
+import elevation
+import training_load
+import route_map
 import single_plot
 import multi_plot
 
-def generate_single_report(arguments):
+SINGLE_PLOTS = {
+	"speed": single_plot.draw_speed_over_time,
+	"elevation": single_plot.draw_elevation_over_time
+}
+
+def report_code():
+	"""Everything report nodes depend on beyond their own inputs: the source of the modules reports are built from,
+	the rc parameters plots are drawn with, and the versions of the libraries which draw them.
+	"""
+	return {
+		"modules": [activity, binning, crunch, efforts, elevation, geo, multi_plot, plotting, route_map, single_plot,
+			track, track_reader, training_load, sys.modules[__name__]],
+		"rc": {key: repr(value) for key, value in matplotlib.rcParams.items() if not key.startswith("backend")},
+		"templates": {name: {key: repr(value) for key, value in template.items()}
+			for name, template in plotting.FIGURE_TEMPLATES.items()},
+		"libraries": {library.__name__: library.__version__ for library in [np, pd, matplotlib, seaborn, jinja2]}
+	}
+
+
+def create_environment():
+	"""Create the jinja environment used to render report templates."""
 	environment = Environment(
 		loader=PackageLoader("cycloanalyzer", "template"),
 		autoescape=select_autoescape(["html", "xml"]))
 	environment.filters["format_number"] = format_number
-	template = environment.get_template("single-report.html")
+	environment.filters["inject_class"] = inject_class
+	return environment
 
-	activities = extract_activities(arguments.input, imperial=True, type_filter=None)
+
+def generate_single_report(arguments):
+	"""Build the single activity report, rebuilding only the plots, route levels and html whose inputs changed.
+	The track is only read and parsed if some part of the report depends on it and is out of date.
+	"""
+	graph = BuildGraph(arguments, arguments.explain, report_code())
+	extract_filepath = source_input_directory(arguments.input)
+	activities = parse_activities_csv(extract_filepath, imperial=True, type_filter=None)
 	selected_activity = crunch.select_activity(activities, iso_date=arguments.date)
+	activity_id = selected_activity.activity_id
+	if selected_activity.activity_type == "Ride":
+		# -elevation applies to rides, as in the aggregate report and the server.
+		elevation.prefer_recomputed_elevation(arguments, [selected_activity])
+
+	graph.input("activity/" + activity_id, selected_activity)
+	track_signature = graph.input("track/" + activity_id,
+		file_signature(os.path.join(extract_filepath, selected_activity.filename)) if selected_activity.filename else None)
+
+	@functools.lru_cache(maxsize=None)
+	def track():
+		return ActivityTrack.load(extract_filepath, selected_activity)
+
+	@functools.lru_cache(maxsize=None)
+	def pyramid():
+		return route_map.build_pyramid(track())
 
-	arguments.show = False
-	single_plot.speed_over_time(arguments)
-	single_plot.elevation_over_time(arguments)
+	# Plots are kept per activity, so that selecting another activity never reuses a plot of the previous one.
+	plot_directory = output_directory(arguments, PLOT_DIRECTORY)
+	plots = {plot_name: graph.output(PLOT_DIRECTORY + "/" + single_plot_filename(activity_id, plot_name),
+			os.path.join(plot_directory, single_plot_filename(activity_id, plot_name)),
+			{"draw": draw, "activity": activity_id, "track": track_signature},
+			lambda draw=draw: render_plot(draw, track()))
+		for plot_name, draw in SINGLE_PLOTS.items()}
 
-	latlong_svg = None
-	with open(os.path.join("plot", "latlong.svg"), "r") as latlong_file:
-		latlong_svg = latlong_file.read()
+	report_directory = output_directory(arguments, "report")
+	route_directory = os.path.join(report_directory, route_map.ROUTE_DIRECTORY)
+	pathlib.Path(route_directory).mkdir(parents=True, exist_ok=True)
+	route_inputs = {"build": route_map.build_pyramid, "activity": activity_id, "track": track_signature}
+	for level in range(route_map.INLINE_ROUTE_LEVELS, len(route_map.ROUTE_LEVEL_TOLERANCES)):
+		sidecar_filename = route_map.route_sidecar_filename(activity_id, level)
+		graph.output("report/" + route_map.ROUTE_DIRECTORY + "/" + sidecar_filename,
+			os.path.join(route_directory, sidecar_filename),
+			dict(route_inputs, sidecar=route_map.route_sidecar),
+			lambda level=level: route_map.route_sidecar(pyramid()[level]))
+	embedded_pyramid = graph.value("route/" + activity_id, route_inputs,
+		lambda: route_map.embedded_levels(pyramid()))
 
-	speed_svg = None
-	with open(os.path.join("plot", "speed.svg"), "r") as speed_file:
-		speed_svg = speed_file.read()
+	route_prefix = route_map.ROUTE_DIRECTORY + "/" + route_map.route_sidecar_prefix(activity_id)
+	model = build_single_model(selected_activity, plots, embedded_pyramid, route_prefix)
+	graph.output("report/single-report.html", os.path.join(report_directory, "single-report.html"),
+		{"template": template_source("single-report.html"), "model": model},
+		functools.partial(render_template, "single-report.html", model))
+	graph.save()
 
-	elevation_svg = None
-	with open(os.path.join("plot", "elevation.svg"), "r") as elevation_file:
-		elevation_svg = elevation_file.read()
 
-	model = {
+def single_plot_filename(activity_id, plot_name):
+	return "{}-{}.svg".format(activity_id, plot_name)
+
+
+def build_single_plots(track):
+	"""Render each plot of a single activity report to svg text, sharing one parsed track.
+	The route itself is drawn by the report from a geometry pyramid rather than as a plot.
+	"""
+	return {plot_name: render_plot(draw, track) for plot_name, draw in SINGLE_PLOTS.items()}
+
+
+def render_single_report(selected_activity, plots, pyramid, route_prefix):
+	"""Render the single activity report template, given the activity, its rendered plots and route geometry pyramid."""
+	return render_template("single-report.html", build_single_model(selected_activity, plots, pyramid, route_prefix))
+
+
+def build_single_model(selected_activity, plots, pyramid, route_prefix):
+	"""Build the single activity report template model.
+	Only the coarse levels of the pyramid are embedded, finer levels are loaded by the report from route_prefix
+	followed by the level number and ".js" as the map is zoomed in.
+	"""
+	return {
 		"name": selected_activity.name,
 		"date": selected_activity.date,
 		"top_speed": selected_activity.max_speed,
@@ -52,50 +147,139 @@ def generate_single_report(arguments):
 		"moving_time": selected_activity.moving_time / 60,
 		"distance": selected_activity.distance,
 		"average_grade": selected_activity.average_grade,
-		"latlong_plot": latlong_svg,
-		"speed_plot": speed_svg,
-		"elevation_plot": elevation_svg
+		"route_levels": [{"level": level["level"], "encoded": level["encoded"]}
+			for level in pyramid[:route_map.INLINE_ROUTE_LEVELS]],
+		"route_tolerances": [level["tolerance"] for level in pyramid],
+		"route_prefix": route_prefix,
+		"speed_plot": plots["speed"],
+		"elevation_plot": plots["elevation"]
 	}
 
-	pathlib.Path("report").mkdir(exist_ok=True)
-	with open(os.path.join("report", "single-report.html"), "w") as report_file:
-		report_file.write(template.render(model))
-
 
 def generate_aggregate_report(arguments):
-	environment = Environment(
-		loader=PackageLoader("cycloanalyzer", "template"),
-		autoescape=select_autoescape(["html", "xml"])
-	)
-	environment.filters["format_number"] = format_number
-	environment.filters["inject_class"] = inject_class
-	template = environment.get_template("multi-report.html")
-
-	rides = extract_activities(arguments.input, imperial=True, type_filter="Ride")
-	
-	first_datetime = rides[0].date
-	last_datetime = rides[-1].date
-
-	weekly_metrics = crunch.crunch_weekly_metrics(rides)
-	ytd_metrics = crunch.crunch_year_to_date_metrics(rides)
-	total_metrics = crunch.crunch_total_metrics(rides)
-
-	arguments.show = False
-	multi_plot.heatmap(arguments)
-	multi_plot.average_distance_over_weekday(arguments)
-	multi_plot.distance_over_time(arguments)
-	multi_plot.distance_histogram(arguments)
-	multi_plot.moving_time_histogram(arguments)
-	
-	heatmap_svg = remove_svg_dimensions(load_plot("heatmap.svg"))
-	adow_svg = remove_svg_dimensions(load_plot("adow.svg"))
-	dot_svg = remove_svg_dimensions(load_plot("dot.svg"))
-	dhist_svg = remove_svg_dimensions(load_plot("dhist.svg"))
-	thist_svg = remove_svg_dimensions(load_plot("thist.svg"))
-	
-	model = {
-		"first_datetime": first_datetime,
-		"last_datetime": last_datetime,
+	"""Build the aggregate report, rebuilding only the crunch results, plots and html whose inputs changed."""
+	graph = BuildGraph(arguments, arguments.explain, report_code())
+	activities = extract_activities(arguments.input, imperial=True, type_filter=None)
+	rides = [activity for activity in activities if activity.activity_type == "Ride"]
+	rides = elevation.prefer_recomputed_elevation(arguments, rides)
+	effort_table = efforts.load_effort_table(arguments, rides)
+	training = training_load.load_training_load(arguments, activities)
+	graph.input("activities", activities)
+	graph.input("rides", rides)
+	graph.input("effort_table", effort_table)
+	graph.input("training", training)
+
+	metrics = crunch_aggregate_metrics(rides, effort_table, training, graph.value)
+	plot_directory = output_directory(arguments, PLOT_DIRECTORY)
+	plots = {plot_name: graph.output(PLOT_DIRECTORY + "/" + plot_name + ".svg",
+			os.path.join(plot_directory, plot_name + ".svg"),
+			dict(inputs, draw=draw),
+			functools.partial(render_plot, draw, *draw_arguments))
+		for plot_name, (draw, draw_arguments, inputs) in aggregate_plot_nodes(rides, effort_table, training, metrics).items()}
+
+	model = build_aggregate_model(rides, plots, metrics)
+	graph.output("report/multi-report.html", os.path.join(output_directory(arguments, "report"), "multi-report.html"),
+		{"template": template_source("multi-report.html"), "model": model},
+		functools.partial(render_template, "multi-report.html", model))
+	graph.save()
+
+
+def aggregate_plot_nodes(rides, effort_table, training, metrics):
+	"""Describe each plot of the aggregate report as (draw function, draw arguments, inputs).
+	Inputs hold only the data a plot actually reads, so that a plot is reused when unrelated data changes.
+	The best effort curve reads the reduced all time bests, rather than every effort of every ride.
+	"""
+	current_year = datetime.date.today().year
+	return {
+		"heatmap": (multi_plot.draw_heatmap, (rides,), {
+			"rides": ride_fields([ride for ride in rides if ride.date.year == current_year], "date", "distance"),
+			"year": current_year}),
+		"adow": (multi_plot.draw_average_distance_over_weekday, (rides,), {"rides": ride_fields(rides, "date", "distance")}),
+		"dot": (multi_plot.draw_distance_over_time, (rides,), {"rides": ride_fields(rides, "distance", "moving_time")}),
+		"dhist": (multi_plot.draw_distance_histogram, (rides,), {"rides": ride_fields(rides, "distance")}),
+		"thist": (multi_plot.draw_moving_time_histogram, (rides,), {"rides": ride_fields(rides, "moving_time")}),
+		"efforts": (multi_plot.draw_best_effort_curve, (effort_table,), {
+			"bests": [row for row in metrics["effort_bests"] if row[0] == "speed"],
+			"latest": latest_effort_values(effort_table, "speed")}),
+		"load": (multi_plot.draw_training_load, (training,), {"training": training.iloc[-365:]})
+	}
+
+
+def compute_value(name, inputs, compute):
+	"""Compute a crunch result outright, in place of a build graph's value method."""
+	return compute()
+
+
+def crunch_aggregate_metrics(rides, effort_table, training, value=compute_value):
+	"""Compute each crunch result used by the aggregate report.
+	Totals, weekly averages and best efforts are reduced from partial results per year. Each partial and
+	result is computed through value(name, inputs, compute), so that a build graph only recomputes the
+	partials of the years whose rides changed, and results whose reduced inputs changed.
+	"""
+	current_year = datetime.date.today().year
+	rides_by_year = {}
+	for ride in rides:
+		rides_by_year.setdefault(ride.date.year, []).append(ride)
+	ride_partials = {year: value("crunch/rides/{}".format(year),
+			{"crunch": crunch.crunch_partial_metrics,
+				"rides": ride_fields(year_rides, "date", "distance", "elevation_gain", "moving_time")},
+			functools.partial(crunch.crunch_partial_metrics, year_rides))
+		for year, year_rides in rides_by_year.items()}
+
+	effort_partials = []
+	if not effort_table.empty:
+		for year, year_table in effort_table.groupby(pd.to_datetime(effort_table.date).dt.year):
+			effort_partials.append(value("crunch/efforts/{}".format(year),
+				{"crunch": efforts.best_effort_values, "effort_table": year_table},
+				functools.partial(efforts.best_effort_values, year_table)))
+	effort_bests = efforts.merge_best_effort_values(effort_partials)
+
+	return {
+		"total": crunch.reduce_total_metrics(ride_partials.values()),
+		"ytd": crunch.reduce_total_metrics([ride_partials.get(current_year, crunch.crunch_partial_metrics([]))]),
+		"weekly": crunch.reduce_weekly_metrics(ride_partials.values()),
+		"effort_bests": effort_bests,
+		"best_efforts": value("crunch/best_efforts", {"crunch": build_best_effort_rows, "bests": effort_bests},
+			functools.partial(build_best_effort_rows, effort_bests)),
+		"training": value("crunch/training", {"crunch": summarize_training_load, "training": training.iloc[-7:]},
+			functools.partial(summarize_training_load, training))
+	}
+
+
+def latest_effort_values(effort_table, metric):
+	"""The [window, value] efforts of a metric for the most recent ride having any."""
+	metric_table = effort_table[effort_table.metric == metric]
+	if metric_table.empty:
+		return []
+	latest_activity_id = metric_table.sort_values("date").activity_id.iloc[-1]
+	latest_table = metric_table[metric_table.activity_id == latest_activity_id]
+	return [[int(window), float(value)] for window, value in zip(latest_table.window, latest_table.value)]
+
+
+def ride_fields(rides, *fields):
+	"""Project rides onto the given fields, as the input of a node which only reads those fields."""
+	return [tuple(getattr(ride, field) for field in fields) for ride in rides]
+
+
+def build_aggregate_plots(rides, effort_table, training, metrics):
+	"""Render each plot used by the aggregate report to svg text, given its crunch results."""
+	return {plot_name: render_plot(draw, *draw_arguments)
+		for plot_name, (draw, draw_arguments, inputs) in aggregate_plot_nodes(rides, effort_table, training, metrics).items()}
+
+
+def render_aggregate_report(rides, plots, metrics):
+	"""Render the aggregate report template, given all rides, their rendered plots and crunch results."""
+	return render_template("multi-report.html", build_aggregate_model(rides, plots, metrics))
+
+
+def build_aggregate_model(rides, plots, metrics):
+	"""Build the aggregate report template model from all rides, their rendered plots and crunch results."""
+	total_metrics = metrics["total"]
+	ytd_metrics = metrics["ytd"]
+	weekly_metrics = metrics["weekly"]
+	return {
+		"first_datetime": rides[0].date,
+		"last_datetime": rides[-1].date,
 		"total_ride_count": total_metrics[0],
 		"total_ride_time": total_metrics[1],
 		"total_ride_distance": total_metrics[2],
@@ -108,24 +292,54 @@ def generate_aggregate_report(arguments):
 		"weekly_time_average": weekly_metrics[1],
 		"weekly_distance_average": weekly_metrics[2],
 		"weekly_elevation_average": weekly_metrics[3],
-		"heatmap_svg": heatmap_svg,
-		"adow_plot": adow_svg,
-		"dot_plot": dot_svg,
-		"dhist_plot": dhist_svg,
-		"thist_plot": thist_svg
+		"heatmap_svg": remove_svg_dimensions(plots["heatmap"]),
+		"adow_plot": remove_svg_dimensions(plots["adow"]),
+		"dot_plot": remove_svg_dimensions(plots["dot"]),
+		"dhist_plot": remove_svg_dimensions(plots["dhist"]),
+		"thist_plot": remove_svg_dimensions(plots["thist"]),
+		"efforts_plot": remove_svg_dimensions(plots["efforts"]),
+		"effort_windows": [efforts.format_window(window) for window in efforts.EFFORT_WINDOWS],
+		"best_efforts": metrics["best_efforts"],
+		"fitness": metrics["training"]["fitness"],
+		"fatigue": metrics["training"]["fatigue"],
+		"form": metrics["training"]["form"],
+		"weekly_load": metrics["training"]["weekly_load"],
+		"load_plot": remove_svg_dimensions(plots["load"])
 	}
 
-	pathlib.Path("report").mkdir(exist_ok=True)
-	with open(os.path.join("report", "multi-report.html"), "w") as report_file:
-		report_file.write(template.render(model))
 
+def summarize_training_load(training):
+	"""Current fitness, fatigue and form, and the load of the last seven days."""
+	return {
+		"fitness": training.fitness.iloc[-1] if not training.empty else 0,
+		"fatigue": training.fatigue.iloc[-1] if not training.empty else 0,
+		"form": training.form.iloc[-1] if not training.empty else 0,
+		"weekly_load": training.load.iloc[-7:].sum()
+	}
 
-def load_plot(plot_name):
-	"""Load an svg from the plot directory, given a filename."""
-	svg_data = None
-	with open(os.path.join("plot", plot_name), "r") as svg_file:
-		svg_data = svg_file.read()
-	return svg_data
+
+def render_template(template_name, model):
+	return create_environment().get_template(template_name).render(model)
+
+
+def template_source(template_name):
+	"""Return the source of a report template, so that editing a template invalidates what it rendered."""
+	environment = create_environment()
+	return environment.loader.get_source(environment, template_name)[0]
+
+
+def build_best_effort_rows(bests):
+	"""Arrange all time best effort values into a row per metric, with a value (or None) per effort window."""
+	rows = []
+	for metric, label in efforts.EFFORT_METRIC_LABELS.items():
+		values_by_window = {window: value for row_metric, window, value in bests if row_metric == metric}
+		if not values_by_window:
+			continue
+		rows.append({
+			"metric": label,
+			"values": [values_by_window.get(window) for window in efforts.EFFORT_WINDOWS]
+		})
+	return rows
 
 
 def remove_svg_dimensions(svg_data):
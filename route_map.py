@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import json
+import numpy as np
+from geo import project
+
+ROUTE_LEVEL_TOLERANCES = [100, 25, 6, 1.5] # meters, coarsest level first
+INLINE_ROUTE_LEVELS = 2 # levels embedded in the report, finer levels are loaded on demand
+POLYLINE_PRECISION = 5 # decimal places kept when quantizing coordinates, roughly one meter
+ROUTE_DIRECTORY = "routes"
+
+def build_pyramid(track):
+    """Simplify a track path at each of the route level tolerances, coarsest first.
+    Each level is a dict holding its tolerance, point count and encoded polyline. Levels are simplified
+    from the next finer level rather than from the full track, so the whole pyramid costs little more
+    than the finest level.
+    """
+    latitudes = track.latitude
+    longitudes = track.longitude
+    projected = project(latitudes, longitudes, np.mean(latitudes) if len(latitudes) else 0.0)
+
+    pyramid = []
+    kept = np.arange(len(projected))
+    for tolerance in reversed(ROUTE_LEVEL_TOLERANCES):
+        kept = kept[douglas_peucker(projected[kept], tolerance)]
+        pyramid.append({
+            "tolerance": tolerance,
+            "points": len(kept),
+            "encoded": encode_polyline(latitudes[kept], longitudes[kept])
+        })
+    pyramid.reverse()
+    for level, entry in enumerate(pyramid):
+        entry["level"] = level
+    return pyramid
+
+
+def douglas_peucker(points, tolerance):
+    """Return a mask of the points kept when simplifying a path with the Douglas-Peucker algorithm.
+    Distances from each span to its interior points are computed vectorized.
+    """
+    keep = np.zeros(len(points), dtype=bool)
+    if len(points) == 0:
+        return keep
+    keep[0] = keep[-1] = True
+
+    spans = [(0, len(points) - 1)]
+    while spans:
+        start, end = spans.pop()
+        if end - start < 2:
+            continue
+        interior = points[start + 1:end] - points[start]
+        chord = points[end] - points[start]
+        chord_length = np.hypot(chord[0], chord[1])
+        if chord_length == 0:
+            distances = np.hypot(interior[:, 0], interior[:, 1])
+        else:
+            distances = np.abs(chord[0] * interior[:, 1] - chord[1] * interior[:, 0]) / chord_length
+        farthest = np.argmax(distances)
+        if distances[farthest] > tolerance:
+            split = start + 1 + farthest
+            keep[split] = True
+            spans.append((start, split))
+            spans.append((split, end))
+    return keep
+
+
+def encode_polyline(latitudes, longitudes, precision=POLYLINE_PRECISION):
+    """Encode a path as quantized integer coordinate deltas, packed five bits per character.
+    This is the widely used encoded polyline format, so each point typically costs a handful of bytes.
+    """
+    quantized = np.round(np.column_stack([latitudes, longitudes]) * 10 ** precision).astype(np.int64)
+    deltas = np.diff(quantized, axis=0, prepend=np.zeros((1, 2), dtype=np.int64)).ravel()
+    values = (deltas << 1) ^ (deltas >> 63)
+
+    characters = []
+    for value in values.tolist():
+        while value >= 0x20:
+            characters.append(chr((0x20 | (value & 0x1f)) + 63))
+            value >>= 5
+        characters.append(chr(value + 63))
+    return "".join(characters)
+
+
+def route_sidecar_prefix(activity_id):
+    """The start of each sidecar filename of an activity, completed by the report with a level and extension."""
+    return "{}-".format(activity_id)
+
+
+def route_sidecar(level):
+    """Render the script which hands a finer route level to a loaded report."""
+    return "routeLevelLoaded({}, {});\n".format(level["level"], json.dumps(level["encoded"]))
+
+
+def route_sidecar_filename(activity_id, level):
+    return "{}{}.js".format(route_sidecar_prefix(activity_id), level)
+
+
+def embedded_levels(pyramid):
+    """Strip a pyramid down to what a report embeds: the inline levels, and the tolerance of every level."""
+    return [level if level["level"] < INLINE_ROUTE_LEVELS else
+        {key: value for key, value in level.items() if key != "encoded"} for level in pyramid]
@@ -0,0 +1,250 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import collections
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+from activity import extract_activities
+from geo import project
+from track import parse_track
+from track_reader import open_track_source, read_tracks
+from track_cache import load_track_table
+
+GEOMETRY_SPACING = 50 # meters between points of simplified geometry
+GEOMETRY_COLUMNS = ["activity_id", "latitude", "longitude"]
+GEOMETRY_CACHE_FILENAME = "geometry.csv"
+GEOMETRY_CACHE_VERSION = 1 # bump if geometry is simplified differently
+CELL_SIZE = 500 # meters per side of a spatial index grid cell
+ROUTE_CANDIDATE_SHARE = 0.5
+ROUTE_MATCH_TOLERANCE = 75
+ROUTE_MATCH_SHARE = 0.9
+
+def route_clusters(arguments):
+    """Print groups of rides which follow the same route."""
+    rides = extract_activities(arguments.input, imperial=True, type_filter="Ride")
+    route_index = RouteIndex(load_geometries(arguments, rides))
+    rides_by_id = {ride.activity_id: ride for ride in rides}
+
+    clusters = [cluster for cluster in route_index.route_clusters() if len(cluster) >= arguments.min_rides]
+    clusters.sort(key=len, reverse=True)
+    for cluster in clusters:
+        cluster_rides = sorted((rides_by_id[activity_id] for activity_id in cluster), key=lambda ride: ride.date)
+        print("{} rides, {} miles on average".format(
+            len(cluster_rides), round(np.mean([ride.distance for ride in cluster_rides]), 2)))
+        for ride in cluster_rides:
+            print("    {} {}".format(ride.date.strftime("%b %d %Y"), ride.name))
+        print("")
+    print("Found {} routes ridden at least {} times".format(len(clusters), arguments.min_rides))
+
+
+def segment_leaderboard(arguments):
+    """Print the fastest efforts between a start and end point, across all rides passing through both."""
+    rides = extract_activities(arguments.input, imperial=True, type_filter="Ride")
+    route_index = RouteIndex(load_geometries(arguments, rides))
+    start = parse_coordinate(arguments.start)
+    end = parse_coordinate(arguments.end)
+
+    candidate_ids = route_index.segment_candidates(start, end, arguments.radius)
+    candidate_rides = [ride for ride in rides if ride.activity_id in candidate_ids]
+    print("Matching {} of {} rides passing near the segment".format(len(candidate_rides), len(rides)))
+
+    efforts = []
+    source = open_track_source(arguments.input)
+    try:
+        for ride, track in read_tracks(source, candidate_rides, parse=parse_track,
+                prefetch=arguments.prefetch, workers=arguments.workers):
+            effort = segment_effort(track, start, end, arguments.radius)
+            if effort is not None:
+                efforts.append((effort[0], effort[1], ride))
+    finally:
+        source.close()
+
+    efforts.sort(key=lambda effort: effort[0])
+    for rank, (elapsed, distance, ride) in enumerate(efforts[:arguments.limit], start=1):
+        print("{:>3}. {} {} {} ({} mph)".format(rank,
+            format_elapsed(elapsed),
+            ride.date.strftime("%b %d %Y"),
+            ride.name,
+            round(distance / elapsed * 2.23694, 2)))
+
+
+def parse_coordinate(coordinate):
+    """Parse a "latitude,longitude" argument."""
+    latitude, longitude = coordinate.split(",")
+    return (float(latitude), float(longitude))
+
+
+def format_elapsed(seconds):
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return "{}:{:02}:{:02}".format(hours, minutes, seconds)
+    return "{}:{:02}".format(minutes, seconds)
+
+
+def simplify_geometry(track, spacing=GEOMETRY_SPACING):
+    """Resample a track path at a fixed distance spacing, bounding the size of its geometry by ride length."""
+    if len(track) < 2:
+        return pd.DataFrame(columns=["latitude", "longitude"])
+
+    distances = track.distance
+    samples = np.append(np.arange(0, distances[-1], spacing), distances[-1])
+    return pd.DataFrame(data={
+        "latitude": np.interp(samples, distances, track.latitude),
+        "longitude": np.interp(samples, distances, track.longitude)
+    })
+
+
+def parse_geometry(data):
+    return simplify_geometry(parse_track(data))
+
+
+def geometry_rows(ride, geometry):
+    return [(ride.activity_id, latitude, longitude)
+        for latitude, longitude in zip(geometry.latitude, geometry.longitude)]
+
+
+def load_geometries(arguments, rides):
+    """Return the simplified geometry of each ride keyed by activity id, cached per activity."""
+    geometry_table = load_track_table(arguments, rides, GEOMETRY_CACHE_FILENAME, GEOMETRY_COLUMNS,
+        parse_geometry, geometry_rows, GEOMETRY_CACHE_VERSION)
+    geometry_table = geometry_table.astype({"latitude": float, "longitude": float})
+    return {activity_id: geometry.reset_index(drop=True)
+        for activity_id, geometry in geometry_table.groupby("activity_id")}
+
+
+class RouteIndex:
+    """Grid hash over simplified track geometry, mapping each grid cell to the activities passing through it.
+    Lookups only touch the cells of the query, so candidates are found without comparing every pair of rides.
+    Coordinates are projected to meters around the mean latitude of all geometry, which is accurate enough
+    for the area covered by one athlete's rides.
+    """
+    def __init__(self, geometries, cell_size=CELL_SIZE):
+        self.cell_size = cell_size
+        self.geometries = geometries
+        latitudes = [geometry.latitude.to_numpy() for geometry in geometries.values()]
+        self.origin_latitude = float(np.mean(np.concatenate(latitudes))) if latitudes else 0.0
+        self.projected = {}
+        self.trees = {}
+        self.cells_by_activity = {}
+        self.activities_by_cell = collections.defaultdict(set)
+        for activity_id, geometry in geometries.items():
+            self.projected[activity_id] = project(geometry.latitude.to_numpy(), geometry.longitude.to_numpy(),
+                self.origin_latitude)
+            cells = self.cells(self.projected[activity_id])
+            self.cells_by_activity[activity_id] = cells
+            for cell in cells:
+                self.activities_by_cell[cell].add(activity_id)
+
+
+    def cells(self, projected):
+        return set(map(tuple, np.floor(projected / self.cell_size).astype(int)))
+
+
+    def nearby_cells(self, projected_point, radius):
+        """Return the cells within a radius, in meters, of a projected point."""
+        low = np.floor((projected_point - radius) / self.cell_size).astype(int)
+        high = np.floor((projected_point + radius) / self.cell_size).astype(int)
+        return [(x, y) for x in range(low[0], high[0] + 1) for y in range(low[1], high[1] + 1)]
+
+
+    def tree(self, activity_id):
+        if activity_id not in self.trees:
+            self.trees[activity_id] = cKDTree(self.projected[activity_id])
+        return self.trees[activity_id]
+
+
+    def route_candidates(self, activity_id, share=ROUTE_CANDIDATE_SHARE):
+        """Return activities sharing at least the given share of grid cells with an activity, in both directions."""
+        cells = self.cells_by_activity[activity_id]
+        shared_counts = collections.Counter()
+        for cell in cells:
+            shared_counts.update(self.activities_by_cell[cell])
+        return [other_id for other_id, shared in shared_counts.items()
+            if other_id != activity_id and shared >= share * max(len(cells), len(self.cells_by_activity[other_id]))]
+
+
+    def route_overlap(self, activity_id, other_id, tolerance=ROUTE_MATCH_TOLERANCE):
+        """Return the share of an activity's geometry lying within a tolerance, in meters, of another's."""
+        distances, indices = self.tree(other_id).query(self.projected[activity_id], distance_upper_bound=tolerance)
+        return np.mean(np.isfinite(distances))
+
+
+    def same_route(self, activity_id, other_id, share=ROUTE_MATCH_SHARE):
+        return self.route_overlap(activity_id, other_id) >= share and \
+            self.route_overlap(other_id, activity_id) >= share
+
+
+    def route_clusters(self):
+        """Group activities into routes, running precise matching only on candidates from the grid index."""
+        parents = {activity_id: activity_id for activity_id in self.geometries}
+
+        def find(activity_id):
+            while parents[activity_id] != activity_id:
+                parents[activity_id] = parents[parents[activity_id]]
+                activity_id = parents[activity_id]
+            return activity_id
+
+        for activity_id in self.geometries:
+            for other_id in self.route_candidates(activity_id):
+                if other_id < activity_id or find(activity_id) == find(other_id):
+                    continue
+                if self.same_route(activity_id, other_id):
+                    parents[find(other_id)] = find(activity_id)
+
+        clusters = collections.defaultdict(list)
+        for activity_id in self.geometries:
+            clusters[find(activity_id)].append(activity_id)
+        return list(clusters.values())
+
+
+    def segment_candidates(self, start, end, radius):
+        """Return activities with geometry in the grid cells near both the start and end of a segment."""
+        projected_start, projected_end = project([start[0], end[0]], [start[1], end[1]], self.origin_latitude)
+        search_radius = radius + GEOMETRY_SPACING
+        near_start = self.activities_near(projected_start, search_radius)
+        near_end = self.activities_near(projected_end, search_radius)
+        return near_start & near_end
+
+
+    def activities_near(self, projected_point, radius):
+        activities = set()
+        for cell in self.nearby_cells(projected_point, radius):
+            activities.update(self.activities_by_cell.get(cell, ()))
+        return activities
+
+
+def segment_effort(track, start, end, radius):
+    """Find the fastest pass from within a radius of the start to within a radius of the end of a segment.
+    Returns (elapsed seconds, distance in meters) or None if the track never completes the segment.
+    """
+    if len(track) < 2:
+        return None
+    seconds = track.seconds
+    distances = track.distance
+
+    start_indices = np.flatnonzero(distance_to(track.latitude, track.longitude, start) <= radius)
+    end_indices = np.flatnonzero(distance_to(track.latitude, track.longitude, end) <= radius)
+    if len(start_indices) == 0 or len(end_indices) == 0:
+        return None
+
+    # Pair each end point with the latest start point before it, which gives the shortest pass.
+    preceding = np.searchsorted(start_indices, end_indices, side="left") - 1
+    valid = preceding >= 0
+    if not valid.any():
+        return None
+    end_indices = end_indices[valid]
+    start_indices = start_indices[preceding[valid]]
+    elapsed = seconds[end_indices] - seconds[start_indices]
+    elapsed[elapsed <= 0] = np.inf
+    best = np.argmin(elapsed)
+    if not np.isfinite(elapsed[best]):
+        return None
+    return (elapsed[best], distances[end_indices[best]] - distances[start_indices[best]])
+
+
+def distance_to(latitudes, longitudes, point):
+    """Distance in meters from each coordinate to a point, projected around the point's latitude."""
+    offsets = project(latitudes, longitudes, point[0]) - project([point[0]], [point[1]], point[0])
+    return np.hypot(offsets[:, 0], offsets[:, 1])
@@ -0,0 +1,279 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import re
+import threading
+import traceback
+import http.server
+from activity import source_input_directory, parse_activities_csv
+from track import ActivityTrack
+from track_reader import is_supported_track
+import efforts
+import elevation
+import training_load
+import route_map
+import report
+
+def serve(arguments):
+    """Load the export once and serve reports from memory over http, reloading when the export changes."""
+    cache = ReportCache(arguments)
+    cache.refresh()
+    cache.aggregate_report()
+
+    watcher = ExportWatcher(cache, arguments.interval)
+    watcher.start()
+
+    http_server = http.server.ThreadingHTTPServer((arguments.host, arguments.port), create_handler(cache))
+    print("Serving reports on http://{}:{}/".format(arguments.host, arguments.port))
+    try:
+        http_server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.stop()
+        http_server.server_close()
+
+
+class ReportCache:
+    """Keeps parsed activities and rendered reports in memory.
+    Rendered reports are keyed by a fingerprint of the data they were built from, so a reload only
+    invalidates the reports whose inputs actually changed. The lock only guards reads and swaps of this
+    state: reports are rendered outside of it, so a slow render never holds up requests for cached reports.
+    """
+    def __init__(self, arguments):
+        self.arguments = arguments
+        self.user_filepath = arguments.input
+        self.lock = threading.Lock()
+        self.source_signature = None
+        self.extract_filepath = None
+        self.activities = []
+        self.activities_by_id = {}
+        self.fingerprints_by_id = {}
+        self.rides = []
+        self.aggregate_fingerprint = None
+        self.effort_table = None
+        self.training = None
+        self.reports = {}
+        self.in_flight = {}
+
+
+    def refresh(self):
+        """Reload the export if it changed on disk since the last refresh.
+        Returns True if any data was reloaded.
+        """
+        signature = self.read_source_signature()
+        if signature == self.source_signature:
+            return False
+
+        extract_filepath = source_input_directory(self.user_filepath)
+        activities = parse_activities_csv(extract_filepath, imperial=True, type_filter=None)
+        fingerprints_by_id = {activity.activity_id: activity_fingerprint(extract_filepath, activity)
+            for activity in activities}
+        rides = [activity for activity in activities if activity.activity_type == "Ride"]
+        rides = elevation.prefer_recomputed_elevation(self.arguments, rides)
+        aggregate_fingerprint = tuple(fingerprints_by_id[activity.activity_id] for activity in activities)
+        effort_table = self.effort_table
+        training = self.training
+        if aggregate_fingerprint != self.aggregate_fingerprint:
+            effort_table = efforts.load_effort_table(self.arguments, rides)
+            training = training_load.load_training_load(self.arguments, activities)
+
+        with self.lock:
+            self.source_signature = signature
+            self.extract_filepath = extract_filepath
+            self.activities = activities
+            self.activities_by_id = {activity.activity_id: activity for activity in activities}
+            self.fingerprints_by_id = fingerprints_by_id
+            self.rides = rides
+            if aggregate_fingerprint != self.aggregate_fingerprint:
+                self.aggregate_fingerprint = aggregate_fingerprint
+                self.effort_table = effort_table
+                self.training = training
+            self.reports = {key: entry for key, entry in self.reports.items()
+                if entry[0] == self.report_fingerprint(key)}
+        return True
+
+
+    def read_source_signature(self):
+        """Return a cheap signature of the export on disk, used to detect that a new export landed."""
+        if self.user_filepath is not None and os.path.isfile(self.user_filepath):
+            watched_filepath = self.user_filepath
+        else:
+            watched_filepath = os.path.join(self.user_filepath or "export", "activities.csv")
+        stat = os.stat(watched_filepath)
+        return (stat.st_mtime_ns, stat.st_size)
+
+
+    def report_fingerprint(self, key):
+        """Return the fingerprint a cached report must carry to be current. Must be called holding the lock."""
+        if key == "aggregate":
+            return self.aggregate_fingerprint
+        return self.fingerprints_by_id.get(key[1])
+
+
+    def cached_report(self, key, build):
+        """Return the cached (fingerprint, ...) entry of a report, building it first if missing or stale.
+        The inputs of the build are snapshotted under the lock and the build runs outside of it. Concurrent
+        requests for a report already being built wait for that build instead of starting their own.
+        """
+        while True:
+            with self.lock:
+                fingerprint = self.report_fingerprint(key)
+                entry = self.reports.get(key)
+                if entry is not None and entry[0] == fingerprint:
+                    return entry
+                building = self.in_flight.get(key)
+                if building is None:
+                    building = self.in_flight[key] = threading.Event()
+                    build_inputs = build(fingerprint)
+                    break
+            building.wait()
+
+        try:
+            entry = build_inputs()
+            with self.lock:
+                if entry[0] == self.report_fingerprint(key):
+                    self.reports[key] = entry
+            return entry
+        finally:
+            with self.lock:
+                del self.in_flight[key]
+            building.set()
+
+
+    def aggregate_report(self):
+        """Return the aggregate report html, rendering it only if the activities changed since the last render."""
+        def build(fingerprint):
+            rides, effort_table, training = self.rides, self.effort_table, self.training
+            def render():
+                metrics = report.crunch_aggregate_metrics(rides, effort_table, training)
+                plots = report.build_aggregate_plots(rides, effort_table, training, metrics)
+                return (fingerprint, report.render_aggregate_report(rides, plots, metrics))
+            return render
+        return self.cached_report("aggregate", build)[1]
+
+
+    def activity(self, activity_id=None):
+        """Return the activity with the given id, or the most recent activity, or None if there is no such activity."""
+        with self.lock:
+            if activity_id is None:
+                return self.activities[-1] if self.activities else None
+            return self.activities_by_id.get(activity_id)
+
+
+    def single_report(self, activity):
+        """Return the single activity report html of an activity."""
+        return self.single(activity)[1]
+
+
+    def route_sidecar(self, activity, level):
+        """Return the script carrying one of the finer route levels of an activity's single report."""
+        return route_map.route_sidecar(self.single(activity)[2][level])
+
+
+    def single(self, activity):
+        """Return the (fingerprint, html, route pyramid) of an activity's single report, building it if stale."""
+        def build(fingerprint):
+            extract_filepath = self.extract_filepath
+            def render():
+                track = ActivityTrack.load(extract_filepath, activity)
+                plots = report.build_single_plots(track)
+                pyramid = route_map.build_pyramid(track)
+                route_prefix = "/{}/{}".format(route_map.ROUTE_DIRECTORY, route_map.route_sidecar_prefix(activity.activity_id))
+                return (fingerprint, report.render_single_report(activity, plots, pyramid, route_prefix), pyramid)
+            return render
+        return self.cached_report(("single", activity.activity_id), build)
+
+
+def activity_fingerprint(extract_filepath, activity):
+    """Identify everything a single activity report depends on: the csv record and the track file."""
+    track_signature = None
+    if activity.filename:
+        track_filepath = os.path.join(extract_filepath, activity.filename)
+        if os.path.exists(track_filepath):
+            stat = os.stat(track_filepath)
+            track_signature = (stat.st_mtime_ns, stat.st_size)
+    return (tuple(vars(activity).values()), track_signature)
+
+
+class ExportWatcher:
+    """Polls the export on a background thread, reloading the cache and re-warming the aggregate report."""
+    def __init__(self, cache, interval):
+        self.cache = cache
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+
+    def start(self):
+        self.thread.start()
+
+
+    def stop(self):
+        self.stopped.set()
+
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                if self.cache.refresh():
+                    print("Export changed, reloaded {} activities".format(len(self.cache.activities)))
+                    self.cache.aggregate_report()
+            except Exception as exception:
+                print("Unable to reload export: {}".format(exception))
+
+
+def create_handler(cache):
+    """Create a request handler class bound to the given report cache."""
+    class ReportRequestHandler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            path = self.path.split("?")[0]
+            activity_match = re.fullmatch(r"/activity/([^/]+)", path)
+            route_match = re.fullmatch(r"/{}/([^/]+)-(\d+)\.js".format(route_map.ROUTE_DIRECTORY), path)
+            content_type = "text/html; charset=utf-8"
+            try:
+                if path in ("/", "/index.html"):
+                    content = cache.aggregate_report()
+                elif path == "/latest" or activity_match:
+                    activity = cache.activity(activity_match.group(1) if activity_match else None)
+                    if not self.check_activity(activity):
+                        return
+                    content = cache.single_report(activity)
+                elif route_match:
+                    activity = cache.activity(route_match.group(1))
+                    level = int(route_match.group(2))
+                    if not self.check_activity(activity):
+                        return
+                    if not route_map.INLINE_ROUTE_LEVELS <= level < len(route_map.ROUTE_LEVEL_TOLERANCES):
+                        self.send_error(404, "No such route level")
+                        return
+                    content = cache.route_sidecar(activity, level)
+                    content_type = "text/javascript; charset=utf-8"
+                else:
+                    self.send_error(404)
+                    return
+            except Exception:
+                traceback.print_exc()
+                self.send_error(500, "Unable to render report")
+                return
+
+            body = content.encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+
+        def check_activity(self, activity):
+            """Send a 404 and return False unless the activity exists and has a track a report can be built from."""
+            if activity is None:
+                self.send_error(404, "No such activity")
+                return False
+            if not is_supported_track(activity.filename):
+                self.send_error(404, "No supported track for activity")
+                return False
+            return True
+
+    return ReportRequestHandler
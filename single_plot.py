@@ -4,116 +4,101 @@
 import os
 import datetime
 import pathlib
-import gpxpy
+import numpy as np
 import pandas as pd
 import seaborn
-import matplotlib.pyplot as plt
-from activity import Activity, create_activity, parse_activities_csv, extract_activities
+from activity import Activity, create_activity, parse_activities_csv, extract_activities, source_input_directory
 from crunch import select_activity
+from plotting import styled_figure, save_plot
+from track import ActivityTrack
+from elevation import smoothed_elevation
 
-def latlong(arguments):
-    """Plot an abstract plot of latitude/longitude scraped from the gpx data."""
-    rides = extract_activities(arguments.input, imperial=True, type_filter="Ride")
+PLOT_POINT_LIMIT = 1000 # points drawn per series, so plot size does not grow with ride length
+
+def load_selected_track(arguments):
+    """Source the export, select the requested ride and load its track."""
+    extract_filepath = source_input_directory(arguments.input)
+    rides = parse_activities_csv(extract_filepath, imperial=True, type_filter="Ride")
     selected_activity = select_activity(rides, arguments.date)
+    return ActivityTrack.load(extract_filepath, selected_activity)
+
 
-    with open("export/" + selected_activity.filename, "r") as gpx_file:
-        gpx = gpxpy.parse(gpx_file)
+def decimate(times, values, limit=PLOT_POINT_LIMIT):
+    """Reduce a series to at most limit points by averaging runs of consecutive samples.
+    Each point is placed at the time of the first sample of its run. Shorter series are returned as is.
+    """
+    times = np.asarray(times)
+    values = np.asarray(values, dtype=float)
+    if len(values) <= limit:
+        return times, values
+    starts = np.linspace(0, len(values), limit, endpoint=False).astype(int)
+    counts = np.diff(np.append(starts, len(values)))
+    return times[starts], np.add.reduceat(values, starts) / counts
+
+
+def latlong(arguments):
+    """Plot an abstract plot of latitude/longitude scraped from the gpx data."""
+    track = load_selected_track(arguments)
+    with styled_figure(show=arguments.show, template="paper") as figure:
+        draw_latlong(figure, track)
+        save_plot(arguments, figure, "latlong.svg")
 
-    trackpoints = []
-    for track in gpx.tracks:
-        for segment in track.segments:
-            for index, point in enumerate(segment.points):
-                time = datetime.datetime.fromisoformat(point.time.isoformat())
-                trackpoints.append((time, point.latitude, point.longitude, point.elevation))
 
+def draw_latlong(figure, track):
+    """Draw the latitude/longitude path of an activity track."""
     latlong_dataframe = pd.DataFrame(data={
-        "time": [point[0] for point in trackpoints],
-        "latitude": [point[1] for point in trackpoints],
-        "longitude": [point[2] for point in trackpoints],
-        "elevation": [point[3] for point in trackpoints]
+        "latitude": track.latitude,
+        "longitude": track.longitude
     })
 
-    plt.clf()
-    seaborn.set_theme(context="paper", style="white")
-    seaborn.despine()
+    ax = figure.subplots()
+    seaborn.despine(ax=ax)
     latlong_plot = seaborn.lineplot(x="latitude", y="longitude", data=latlong_dataframe,
-        sort=False, estimator=None, ci=None)
+        sort=False, estimator=None, ci=None, ax=ax)
     latlong_plot.set(xlabel="", ylabel="")
 
-    pathlib.Path("plot").mkdir(exist_ok=True)
-    plt.savefig(os.path.join("plot", "latlong.svg"))
-
-    if arguments.show:
-        plt.show()
-
 
 def speed_over_time(arguments):
-    rides = extract_activities(arguments.input, imperial=True, type_filter="Ride")
-    selected_activity = select_activity(rides, arguments.date)
-    
-    with open("export/" + selected_activity.filename, "r") as gpx_file:
-        gpx = gpxpy.parse(gpx_file)
-
-    trackpoints = []
-    times_and_speeds = []
-    for track in gpx.tracks:
-        for segment in track.segments:
-            for index, point in enumerate(segment.points):
-                time = datetime.datetime.fromisoformat(point.time.isoformat())
-                speed = 0
-                if index < len(segment.points) - 1:
-                    speed = point.speed_between(segment.points[index + 1])
-                times_and_speeds.append((time, speed * 2.23694))
+    track = load_selected_track(arguments)
+    with styled_figure(show=arguments.show) as figure:
+        draw_speed_over_time(figure, track)
+        save_plot(arguments, figure, "speed.svg")
+
 
+def draw_speed_over_time(figure, track):
+    """Draw rolling average speed over the course of an activity track, decimated to the plot point limit."""
+    times, speeds = decimate(track.time, track.smoothed_speed)
     speed_dataframe = pd.DataFrame(data={
-        "datetime": [point[0] for point in times_and_speeds],
-        "speed": [point[1] for point in times_and_speeds]
+        "datetime": times,
+        "bin_speed": speeds
     })
-    speed_dataframe["bin_speed"] = speed_dataframe.rolling(window=15).mean()
 
-    plt.clf()
-    seaborn.set_theme()
-    avg_plot = seaborn.lineplot(x="datetime", y="bin_speed", data=speed_dataframe)
+    ax = figure.subplots()
+    avg_plot = seaborn.lineplot(x="datetime", y="bin_speed", data=speed_dataframe, ax=ax)
     avg_plot.set(xlabel="Time", ylabel="Speed (miles / hour)")
-    plt.fill_between(speed_dataframe.datetime.values, speed_dataframe.bin_speed.values)
-    plt.title("Speed over Time")
-
-    pathlib.Path("plot").mkdir(exist_ok=True)
-    plt.savefig(os.path.join("plot", "speed.svg"))
-    
-    if arguments.show:
-        plt.show()
+    ax.fill_between(speed_dataframe.datetime.values, speed_dataframe.bin_speed.values)
+    ax.set_title("Speed over Time")
 
 
 def elevation_over_time(arguments):
-    rides = extract_activities(arguments.input, imperial=True, type_filter="Ride")
-    selected_activity = select_activity(rides, arguments.date)
-
-    with open("export/" + selected_activity.filename, "r") as gpx_file:
-        gpx = gpxpy.parse(gpx_file)
+    track = load_selected_track(arguments)
+    with styled_figure(show=arguments.show) as figure:
+        draw_elevation_over_time(figure, track)
+        save_plot(arguments, figure, "elevation.svg")
 
-    trackpoints = []
-    for track in gpx.tracks:
-        for segment in track.segments:
-            for point in segment.points:
-                trackpoints.append((datetime.datetime.fromisoformat(point.time.isoformat()), point.elevation))
 
+def draw_elevation_over_time(figure, track):
+    """Draw noise filtered elevation over the course of an activity track, decimated to the plot point limit."""
+    times, elevations = decimate(track.time, smoothed_elevation(track))
     elevation_dataframe = pd.DataFrame(data={
-        "datetime": [point[0] for point in trackpoints],
-        "elevation": [point[1] for point in trackpoints]
+        "datetime": times,
+        "elevation": elevations
     })
 
-    plt.clf()
-    seaborn.set_theme()
+    ax = figure.subplots()
     elevation_plot = seaborn.lineplot(
-        x="datetime", y="elevation", data=elevation_dataframe)
+        x="datetime", y="elevation", data=elevation_dataframe, ax=ax)
     elevation_plot.set(xlabel="Time", ylabel="Elevation (meters)")
     elevation_plot.axes.set_ylim(elevation_dataframe.elevation.min(), elevation_dataframe.elevation.max())
-    plt.fill_between(elevation_dataframe.datetime.values, elevation_dataframe.elevation.values)
-    plt.title("Elevation over Time")
-
-    pathlib.Path("plot").mkdir(exist_ok=True)
-    plt.savefig(os.path.join("plot", "elevation.svg"))
-    
-    if arguments.show:
-        plt.show()
+    ax.fill_between(elevation_dataframe.datetime.values, elevation_dataframe.elevation.values)
+    ax.set_title("Elevation over Time")
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import csv
+import gzip
+import math
+import argparse
+import datetime
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+ACTIVITY_COLUMNS = ["Activity ID", "Activity Date", "Activity Name", "Activity Type", "Elapsed Time", "Distance",
+    "Filename", "Moving Time", "Max Speed", "Average Speed", "Elevation Gain", "Elevation Low", "Elevation High",
+    "Max Grade", "Average Grade", "Perceived Exertion", "Perceived Relative Effort"]
+
+def pytest_addoption(parser):
+    parser.addoption("--run-slow", action="store_true", help="also run slow tests")
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "slow: slow test, only run with --run-slow")
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption("--run-slow"):
+        return
+    skip_slow = pytest.mark.skip(reason="slow, run with --run-slow")
+    for item in items:
+        if "slow" in item.keywords:
+            item.add_marker(skip_slow)
+
+
+def loop_gpx(start, points, radius=0.01, seconds_per_point=2, latitude=47.6, longitude=-122.3):
+    """Build gpx text for a ride around a circular loop, with rolling elevation."""
+    trackpoints = []
+    for index in range(points):
+        angle = 2 * math.pi * index / points
+        time = start + datetime.timedelta(seconds=index * seconds_per_point)
+        trackpoints.append('<trkpt lat="{:.6f}" lon="{:.6f}"><ele>{:.1f}</ele><time>{}</time></trkpt>'.format(
+            latitude + radius * math.sin(angle), longitude + radius * math.cos(angle),
+            50 + 20 * math.sin(3 * angle), time.strftime("%Y-%m-%dT%H:%M:%SZ")))
+    return ('<?xml version="1.0" encoding="UTF-8"?><gpx version="1.1" creator="test" '
+        'xmlns="http://www.topografix.com/GPX/1/1"><trk><trkseg>{}</trkseg></trk></gpx>').format("".join(trackpoints))
+
+
+def write_export(directory, rides, compress=False):
+    """Write an export directory holding activities.csv and a loop track per ride.
+    Each ride is a dict with an id, a datetime and a number of points, and optionally raw track data.
+    """
+    os.makedirs(os.path.join(directory, "activities"), exist_ok=True)
+    with open(os.path.join(directory, "activities.csv"), "w", newline="") as activities_file:
+        writer = csv.DictWriter(activities_file, fieldnames=ACTIVITY_COLUMNS)
+        writer.writeheader()
+        for index, ride in enumerate(rides):
+            filename = "activities/{}.gpx{}".format(ride["id"], ".gz" if compress else "")
+            data = ride.get("data")
+            if data is None:
+                data = loop_gpx(ride["date"], ride.get("points", 300)).encode("utf-8")
+                if compress:
+                    data = gzip.compress(data)
+            with open(os.path.join(directory, filename), "wb") as track_file:
+                track_file.write(data)
+            points = ride.get("points", 300)
+            distance = 7000 + 4000 * (index % 5)
+            moving_time = points * 2 + 600 * (index % 3)
+            writer.writerow({
+                "Activity ID": ride["id"],
+                "Activity Date": ride["date"].strftime("%b %d, %Y, %I:%M:%S %p"),
+                "Activity Name": "Ride {}".format(ride["id"]),
+                "Activity Type": "Ride",
+                "Elapsed Time": moving_time + 120,
+                "Distance": distance,
+                "Filename": filename,
+                "Moving Time": moving_time,
+                "Max Speed": 12,
+                "Average Speed": distance / moving_time,
+                "Elevation Gain": 120,
+                "Elevation Low": 30,
+                "Elevation High": 70,
+                "Max Grade": 5,
+                "Average Grade": 0.5,
+                "Perceived Exertion": "",
+                "Perceived Relative Effort": ""
+            })
+    return directory
+
+
+def recent_rides(count, first_id=1000, points=300):
+    """One ride a day, ending yesterday, so that weekday and year to date plots have data.
+    Early in the year the rides instead start on the first of the year.
+    """
+    today = datetime.date.today()
+    start = datetime.datetime.combine(today, datetime.time(8)) - datetime.timedelta(days=count)
+    if start.year != today.year:
+        start = datetime.datetime(today.year, 1, 1, 8)
+    return [{"id": str(first_id + index), "date": start + datetime.timedelta(days=index), "points": points}
+        for index in range(count)]
+
+
+def command_arguments(input_path, output_path, **overrides):
+    """Build the global and command arguments the commands read, as argparse would."""
+    values = dict(input=input_path, output=output_path, prefetch=4, workers=1, elevation="export", date=None,
+        show=False, explain=False)
+    values.update(overrides)
+    return argparse.Namespace(**values)
+
+
+@pytest.fixture
+def export(tmp_path):
+    return write_export(str(tmp_path / "export"), recent_rides(8))
@@ -0,0 +1,28 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import csv
+import shutil
+import argparse
+from conftest import write_export, recent_rides
+from batch import batch
+
+def test_batch_of_archives_runs_twice(tmp_path):
+    exports_directory = tmp_path / "exports"
+    exports_directory.mkdir()
+    for name, first_id in (("alice", 1000), ("bob", 2000)):
+        export = write_export(str(tmp_path / name), recent_rides(8, first_id=first_id))
+        shutil.make_archive(str(exports_directory / name), "zip", export)
+
+    output = str(tmp_path / "output")
+    arguments = argparse.Namespace(exports=str(exports_directory), output=output, reports=["report-all"],
+        processes=1, prefetch=4, elevation="export")
+    for run in range(2):
+        batch(arguments)
+        with open(os.path.join(output, "summary.csv"), newline="") as summary_file:
+            results = list(csv.DictReader(summary_file))
+        assert [(result["name"], result["status"]) for result in results] == [("alice", "ok"), ("bob", "ok")]
+
+    assert sorted(os.listdir(exports_directory)) == ["alice.zip", "bob.zip"]
+    assert os.path.exists(os.path.join(output, "alice", "report", "multi-report.html"))
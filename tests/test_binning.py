@@ -0,0 +1,40 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import pytest
+from binning import bin_edges, binned_statistics
+
+def test_fixed_edges_span_the_range_evenly():
+    assert bin_edges([0, 3, 10], 5, "fixed").tolist() == [0, 2, 4, 6, 8, 10]
+
+
+def test_quantile_edges_hold_equal_counts():
+    assert bin_edges(np.arange(9), 4, "quantile").tolist() == [0, 2, 4, 6, 8]
+    # Duplicate quantiles collapse into fewer bins.
+    assert bin_edges([1, 1, 1, 1, 5], 4, "quantile").tolist() == [1, 5]
+
+
+def test_invalid_bins_and_methods_are_rejected():
+    with pytest.raises(ValueError):
+        bin_edges([1, 2], 0)
+    with pytest.raises(ValueError):
+        bin_edges([1, 2], 2, "log")
+
+
+def test_binned_statistics_means_and_counts():
+    x = [0, 1, 9, 10]
+    y = [0, 0, 0, 10]
+    values = [2, 4, 6, 8]
+    means, counts = binned_statistics(x, y, values, x_bins=2, y_bins=2)
+    assert means.index.tolist() == ["0-5", "5-10"]
+    assert means.columns.tolist() == ["0-5", "5-10"]
+    assert counts.to_numpy().tolist() == [[2, 1], [0, 1]]
+    assert means.iloc[0].tolist() == [3, 6]
+    assert np.isnan(means.iloc[1, 0]) and means.iloc[1, 1] == 8
+
+
+def test_binned_statistics_of_constant_input_is_a_single_cell():
+    means, counts = binned_statistics([4, 4, 4], [7, 7, 7], [1, 2, 6], x_bins=3, y_bins=3, method="quantile")
+    assert counts.to_numpy().tolist() == [[3]]
+    assert means.to_numpy().tolist() == [[3]]
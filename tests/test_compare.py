@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import argparse
+import pytest
+from activity import parse_activities_csv
+from conftest import write_export, recent_rides, command_arguments
+from compare import select_rides, load_tracks
+
+def select(export, *dates):
+    rides = parse_activities_csv(export, imperial=True, type_filter="Ride")
+    return rides, select_rides(argparse.Namespace(dates=list(dates)), rides)
+
+
+def rides_date(export, index):
+    rides = parse_activities_csv(export, imperial=True, type_filter="Ride")
+    return rides[index].date.date().isoformat()
+
+
+def test_select_rides_by_date(export):
+    rides, selected = select(export, rides_date(export, 3), rides_date(export, 1))
+    assert selected == [rides[3], rides[1]]
+
+
+def test_select_rides_rejects_a_date_without_a_ride(export):
+    with pytest.raises(RuntimeError, match="No ride found on 1999-01-01"):
+        select(export, rides_date(export, 0), "1999-01-01")
+
+
+def test_select_rides_rejects_repeated_rides(export):
+    with pytest.raises(RuntimeError, match="selected more than once"):
+        select(export, rides_date(export, 2), rides_date(export, 2) + "T12:00")
+
+
+
+def test_select_rides_rejects_a_reference_date_without_a_ride(export, tmp_path):
+    rides = parse_activities_csv(export, imperial=True, type_filter="Ride")
+    arguments = command_arguments(export, str(tmp_path / "output"), dates=None, date="1999-01-01", limit=20)
+    with pytest.raises(RuntimeError, match="No ride found on 1999-01-01"):
+        select_rides(arguments, rides)
+
+
+def test_load_tracks_requires_the_reference_track(tmp_path):
+    rides = recent_rides(3)
+    rides[0]["data"] = b"<gpx"
+    export = write_export(str(tmp_path / "export"), rides)
+    rides = parse_activities_csv(export, imperial=True, type_filter="Ride")
+    arguments = command_arguments(export, str(tmp_path / "output"))
+
+    loaded_rides, tracks = load_tracks(arguments, [rides[1], rides[0], rides[2]])
+    assert loaded_rides == [rides[1], rides[2]] and len(tracks) == 2
+    with pytest.raises(RuntimeError, match="reference ride"):
+        load_tracks(arguments, rides)
@@ -0,0 +1,28 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import datetime
+import pytest
+from activity import Activity
+from crunch import crunch_partial_metrics, crunch_total_metrics, reduce_total_metrics, reduce_weekly_metrics
+
+def ride(date, distance, moving_time, elevation_gain):
+    activity = Activity()
+    activity.date = date
+    activity.distance = distance
+    activity.moving_time = moving_time
+    activity.elevation_gain = elevation_gain
+    return activity
+
+
+def test_partials_reduce_to_totals_and_weekly_averages():
+    # A saturday, the sunday closing that week, and a ride two weeks later with an empty week between.
+    first_rides = [ride(datetime.datetime(2023, 12, 30, 8), 10, 3600, 100)]
+    later_rides = [ride(datetime.datetime(2023, 12, 31, 8) + datetime.timedelta(days=offset), 20, 1800, 200)
+        for offset in (0, 14)]
+    partials = [crunch_partial_metrics(first_rides), crunch_partial_metrics(later_rides)]
+
+    assert reduce_total_metrics(partials) == (3, 2, 50, 500)
+    assert crunch_total_metrics(first_rides + later_rides) == (3, 2, 50, 500)
+    assert reduce_weekly_metrics(partials) == pytest.approx((1, 40, 50 / 3, 500 / 3))
+    assert reduce_weekly_metrics([crunch_partial_metrics([])]) == (0, 0, 0, 0)
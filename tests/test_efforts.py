@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import pytest
+from efforts import best_efforts, merge_best_effort_values
+
+MPH_PER_METER_PER_SECOND = 2.23694
+
+class SampledTrack:
+    """A track sampled once a second, from per second speeds (m/s) and optional power (watts)."""
+    def __init__(self, speeds, power=None):
+        self.seconds = np.arange(len(speeds) + 1, dtype=float)
+        self.distance = np.concatenate([[0.0], np.cumsum(speeds)])
+        self.heart_rate = np.full(len(self.seconds), np.nan)
+        self.power = np.full(len(self.seconds), np.nan) if power is None else np.append(power, power[-1])
+
+
+    def __len__(self):
+        return len(self.seconds)
+
+
+def efforts_by_key(track):
+    return {(metric, window): value for metric, window, value in best_efforts(track)}
+
+
+def test_constant_speed_is_the_best_of_every_window_and_long_windows_are_omitted():
+    efforts = efforts_by_key(SampledTrack(np.full(600, 10.0)))
+    assert sorted(efforts) == [("speed", 30), ("speed", 60), ("speed", 300)]
+    for value in efforts.values():
+        assert value == pytest.approx(10 * MPH_PER_METER_PER_SECOND)
+
+
+def test_best_window_finds_the_fastest_stretch():
+    speeds = np.concatenate([np.full(300, 5.0), np.full(60, 15.0), np.full(240, 5.0)])
+    power = np.concatenate([np.full(300, 200.0), np.full(60, 400.0), np.full(240, 200.0)])
+    efforts = efforts_by_key(SampledTrack(speeds, power))
+    assert efforts[("speed", 30)] == pytest.approx(15 * MPH_PER_METER_PER_SECOND)
+    assert efforts[("speed", 60)] == pytest.approx(15 * MPH_PER_METER_PER_SECOND)
+    assert efforts[("speed", 300)] == pytest.approx(7 * MPH_PER_METER_PER_SECOND)
+    assert efforts[("power", 30)] == pytest.approx(400)
+    assert efforts[("power", 300)] == pytest.approx(240)
+    assert ("heart_rate", 30) not in efforts
+
+
+def test_too_short_track_has_no_efforts():
+    assert best_efforts(SampledTrack([])) == []
+
+
+def test_merge_keeps_the_best_of_each_metric_and_window():
+    first_year = [["speed", 30, 20.0], ["speed", 60, 18.0]]
+    second_year = [["speed", 30, 22.0], ["speed", 60, 17.0], ["power", 30, 300.0]]
+    assert merge_best_effort_values([first_year, second_year]) == [
+        ["power", 30, 300.0], ["speed", 30, 22.0], ["speed", 60, 18.0]]
+    assert merge_best_effort_values([]) == []
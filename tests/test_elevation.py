@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import pytest
+from elevation import hysteresis_pivots, elevation_summary, HYSTERESIS_THRESHOLD
+
+class ProfileTrack:
+    """A track given directly by elevations sampled every ten meters of distance."""
+    def __init__(self, elevations):
+        self.elevation = np.asarray(elevations, dtype=float)
+        self.distance = np.arange(len(elevations)) * 10.0
+
+
+def pivots(values):
+    return hysteresis_pivots(np.asarray(values, dtype=float)).tolist()
+
+
+def test_flat_input_has_no_pivots():
+    assert pivots(np.full(50, 12.0)) == []
+    assert pivots([5.0]) == []
+
+
+def test_monotonic_descent_is_one_swing():
+    assert pivots(np.linspace(100, 80, 30)) == [0, 29]
+
+
+def test_swings_under_the_threshold_are_ignored():
+    swing = HYSTERESIS_THRESHOLD - 0.1
+    assert pivots([0, swing, 0, swing, 0, swing, 0]) == []
+
+
+def test_swings_over_the_threshold_are_pivots():
+    swing = HYSTERESIS_THRESHOLD + 0.1
+    assert pivots([0, swing, 0, swing, 0]) == [0, 1, 2, 3, 4]
+    # Small wobbles within a climb neither end it nor start a descent.
+    assert pivots([0, 10, 8, 20, 17, 30, 0]) == [0, 5, 6]
+
+
+def test_elevation_summary_counts_climbs_and_descents():
+    profile = np.concatenate([np.full(50, 0.0), np.linspace(0, 50, 100), np.full(50, 50.0),
+        np.linspace(50, 20, 60), np.full(50, 20.0)])
+    elevation_gain, elevation_loss, climbs = elevation_summary(ProfileTrack(profile))
+    assert elevation_gain == pytest.approx(50)
+    assert elevation_loss == pytest.approx(30)
+    assert len(climbs) == 1
+    assert climbs[0][2] == pytest.approx(50)
+
+
+def test_elevation_summary_without_elevation_is_none():
+    assert elevation_summary(ProfileTrack(np.full(10, np.nan))) is None
@@ -0,0 +1,38 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import resource
+import numpy as np
+import pytest
+import matplotlib.pyplot as plt
+from plotting import render_plot
+
+WARMUP_RENDERS = 20
+
+def draw_sample(figure, values):
+    axes = figure.subplots(1, 2)
+    axes[0].plot(values)
+    axes[1].hist(values, bins=20)
+    figure.suptitle("sample")
+
+
+def peak_rss_kb():
+    """Peak resident set size of this process, in kilobytes on linux."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+@pytest.mark.parametrize("renders, growth_limit_kb", [
+    (60, 20 * 1024),
+    pytest.param(3000, 10 * 1024, marks=pytest.mark.slow) # catches leaks of a few kilobytes per figure
+])
+def test_render_plot_memory_stays_bounded(renders, growth_limit_kb):
+    values = np.random.default_rng(0).normal(size=200)
+    for _ in range(WARMUP_RENDERS):
+        render_plot(draw_sample, values)
+    baseline = peak_rss_kb()
+
+    for _ in range(renders):
+        svg = render_plot(draw_sample, values)
+    assert svg.startswith("<?xml")
+    assert peak_rss_kb() - baseline < growth_limit_kb
+    assert plt.get_fignums() == []
@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import pytest
+from conftest import command_arguments
+from activity import parse_activities_csv
+from plotting import render_plot
+from track import ActivityTrack
+import single_plot
+import server
+import report
+
+def test_single_report_plots_are_kept_per_activity(export, tmp_path):
+    rides = parse_activities_csv(export, imperial=True, type_filter="Ride")
+    # Extracted archives can leave tracks of equal size with equal modification times.
+    for ride in rides:
+        os.utime(os.path.join(export, ride.filename), ns=(0, 0))
+
+    def single_report(ride):
+        arguments = command_arguments(export, str(tmp_path / "output"), date=ride.date.date().isoformat())
+        report.generate_single_report(arguments)
+        with open(os.path.join(arguments.output, "report", "single-report.html"), "r") as report_file:
+            return report_file.read()
+
+    def speed_plot(ride):
+        return render_plot(single_plot.draw_speed_over_time, ActivityTrack.load(export, ride))
+
+    for ride in [rides[0], rides[1], rides[0]]:
+        assert speed_plot(ride) in single_report(ride)
+
+
+@pytest.mark.parametrize("elevation", ["export", "track"])
+def test_unchanged_export_rebuilds_nothing(export, tmp_path, capsys, elevation):
+    arguments = command_arguments(export, str(tmp_path / "output"), elevation=elevation, explain=True)
+    report.generate_aggregate_report(arguments)
+    report.generate_single_report(arguments)
+    capsys.readouterr()
+
+    report.generate_aggregate_report(arguments)
+    report.generate_single_report(arguments)
+    statuses = [line.split()[0] for line in capsys.readouterr().out.splitlines() if not line.startswith("Selected")]
+    assert statuses and set(statuses) <= {"unchanged", "reused"}
+
+
+def test_code_change_rebuilds_every_node(export, tmp_path, capsys, monkeypatch):
+    arguments = command_arguments(export, str(tmp_path / "output"), explain=True)
+    report.generate_aggregate_report(arguments)
+    capsys.readouterr()
+
+    code = report.report_code()
+    monkeypatch.setattr(report, "report_code", lambda: dict(code, libraries={}))
+    report.generate_aggregate_report(arguments)
+    lines = [line for line in capsys.readouterr().out.splitlines() if line.split()[0] not in ("changed", "unchanged")]
+    assert lines and all(line.startswith("rebuilt") and "code" in line for line in lines)
+
+
+@pytest.mark.parametrize("elevation", ["export", "track"])
+def test_single_report_elevation_matches_the_server(export, tmp_path, elevation):
+    arguments = command_arguments(export, str(tmp_path / "output"), elevation=elevation)
+    report.generate_single_report(arguments)
+    with open(os.path.join(arguments.output, "report", "single-report.html"), "r") as report_file:
+        single_report = report_file.read()
+
+    cache = server.ReportCache(command_arguments(export, str(tmp_path / "served"), elevation=elevation))
+    cache.refresh()
+    served_activity = cache.activity()
+    assert "{:0.2f} feet".format(served_activity.elevation_gain) in single_report
+    assert ("{:0.2f} feet".format(120 * 3.28084) in single_report) == (elevation == "export")
@@ -0,0 +1,31 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import datetime
+import numpy as np
+from conftest import loop_gpx
+from track import ActivityTrack
+from track_reader import parse_trackpoints
+from route_map import encode_polyline, douglas_peucker, build_pyramid, ROUTE_LEVEL_TOLERANCES
+
+def test_encode_polyline_matches_the_reference_vector():
+    latitudes = np.array([38.5, 40.7, 43.252])
+    longitudes = np.array([-120.2, -120.95, -126.453])
+    assert encode_polyline(latitudes, longitudes) == "_p~iF~ps|U_ulLnnqC_mqNvxq`@"
+
+
+def test_douglas_peucker_keeps_points_beyond_the_tolerance():
+    points = np.array([[0, 0], [100, 1], [200, 5], [300, -1], [400, 0]], dtype=float)
+    assert douglas_peucker(points, 4).tolist() == [True, False, True, False, True]
+    assert douglas_peucker(points, 6).tolist() == [True, False, False, False, True]
+    assert douglas_peucker(points, 0.5).all()
+    assert douglas_peucker(np.zeros((0, 2)), 1).tolist() == []
+
+
+def test_pyramid_levels_run_coarse_to_fine():
+    track = ActivityTrack(parse_trackpoints(loop_gpx(datetime.datetime(2024, 5, 1, 8), 500).encode("utf-8")))
+    pyramid = build_pyramid(track)
+    assert [level["tolerance"] for level in pyramid] == ROUTE_LEVEL_TOLERANCES
+    assert [level["level"] for level in pyramid] == list(range(len(ROUTE_LEVEL_TOLERANCES)))
+    point_counts = [level["points"] for level in pyramid]
+    assert point_counts == sorted(point_counts) and point_counts[-1] <= len(track)
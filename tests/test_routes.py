@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import datetime
+import pytest
+from conftest import loop_gpx
+from track import ActivityTrack
+from track_reader import parse_trackpoints
+from routes import RouteIndex, simplify_geometry, segment_effort
+
+START = datetime.datetime(2024, 5, 1, 8)
+
+def loop_track(latitude=47.6, points=300):
+    return ActivityTrack(parse_trackpoints(loop_gpx(START, points, latitude=latitude).encode("utf-8")))
+
+
+@pytest.fixture
+def tracks():
+    return {
+        "loop": loop_track(),
+        "shifted": loop_track(latitude=47.6001), # the same loop, about ten meters north
+        "distant": loop_track(latitude=48.0)
+    }
+
+
+@pytest.fixture
+def route_index(tracks):
+    return RouteIndex({activity_id: simplify_geometry(track) for activity_id, track in tracks.items()})
+
+
+def test_overlapping_loops_cluster_into_one_route(route_index):
+    clusters = sorted(sorted(cluster) for cluster in route_index.route_clusters())
+    assert clusters == [["distant"], ["loop", "shifted"]]
+    assert route_index.same_route("loop", "shifted")
+    assert route_index.route_candidates("distant") == []
+
+
+def test_segment_candidates_come_from_nearby_cells(tracks, route_index):
+    track = tracks["loop"]
+    start = (track.latitude[0], track.longitude[0])
+    end = (track.latitude[75], track.longitude[75])
+    assert route_index.segment_candidates(start, end, 30) == {"loop", "shifted"}
+
+
+def test_segment_effort_times_the_pass_between_start_and_end(tracks):
+    track = tracks["loop"]
+    start = (track.latitude[0], track.longitude[0])
+    end = (track.latitude[75], track.longitude[75])
+    elapsed, distance = segment_effort(track, start, end, 5)
+    assert elapsed == 150
+    assert distance == pytest.approx(track.distance[75] - track.distance[0])
+
+    assert segment_effort(tracks["distant"], start, end, 5) is None
+    # The start must be passed before the end.
+    assert segment_effort(track, end, (track.latitude[10], track.longitude[10]), 5) is None
@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import threading
+import http.client
+import http.server
+import pytest
+from conftest import write_export, recent_rides, command_arguments
+import server
+
+@pytest.fixture
+def base_url(tmp_path):
+    rides = recent_rides(4)
+    rides[1]["data"] = b"not a gzip stream"
+    export = write_export(str(tmp_path / "export"), rides, compress=True)
+    cache = server.ReportCache(command_arguments(export, str(tmp_path / "output")))
+    cache.refresh()
+    # A track a report cannot be built from, as exports often hold.
+    cache.activities_by_id[rides[2]["id"]].filename = "activities/{}.fit.gz".format(rides[2]["id"])
+
+    http_server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), server.create_handler(cache))
+    thread = threading.Thread(target=http_server.serve_forever, daemon=True)
+    thread.start()
+    yield http_server.server_address, rides
+    http_server.shutdown()
+    http_server.server_close()
+
+
+def status(address, path):
+    connection = http.client.HTTPConnection(*address, timeout=60)
+    try:
+        connection.request("GET", path)
+        return connection.getresponse().status
+    finally:
+        connection.close()
+
+
+def test_requests_are_answered_with_a_status(base_url):
+    address, rides = base_url
+    assert status(address, "/latest") == 200
+    assert status(address, "/activity/{}".format(rides[0]["id"])) == 200
+    assert status(address, "/routes/{}-3.js".format(rides[0]["id"])) == 200
+    assert status(address, "/activity/missing") == 404
+    assert status(address, "/routes/{}-0.js".format(rides[0]["id"])) == 404
+    assert status(address, "/routes/missing-3.js") == 404
+    assert status(address, "/activity/{}".format(rides[2]["id"])) == 404
+    assert status(address, "/activity/{}".format(rides[1]["id"])) == 500
@@ -0,0 +1,30 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import datetime
+import numpy as np
+import pytest
+from conftest import loop_gpx
+from plotting import render_plot
+from track import ActivityTrack
+from track_reader import parse_trackpoints
+import single_plot
+
+def test_decimate_averages_runs_of_samples():
+    times = np.arange(10)
+    decimated_times, decimated_values = single_plot.decimate(times, np.arange(10.0), limit=5)
+    assert decimated_times.tolist() == [0, 2, 4, 6, 8]
+    assert decimated_values.tolist() == [0.5, 2.5, 4.5, 6.5, 8.5]
+
+    short_times, short_values = single_plot.decimate(times, np.arange(10.0), limit=10)
+    assert short_values.tolist() == list(range(10))
+
+
+@pytest.mark.parametrize("draw", [single_plot.draw_speed_over_time, single_plot.draw_elevation_over_time])
+def test_plot_size_does_not_grow_with_ride_length(draw):
+    start = datetime.datetime(2024, 5, 1, 8)
+    sizes = []
+    for points in (2 * single_plot.PLOT_POINT_LIMIT, 20 * single_plot.PLOT_POINT_LIMIT):
+        track = ActivityTrack(parse_trackpoints(loop_gpx(start, points).encode("utf-8")))
+        sizes.append(len(render_plot(draw, track)))
+    assert sizes[1] < sizes[0] * 1.2
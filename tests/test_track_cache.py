@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+from conftest import write_export, recent_rides, loop_gpx, command_arguments
+from activity import parse_activities_csv
+from track import parse_track
+from track_cache import load_track_table
+
+COLUMNS = ["activity_id", "points"]
+
+class CountingParse:
+    """Parse tracks to their point count, recording which tracks were parsed."""
+    def __init__(self):
+        self.parsed = []
+
+
+    def __call__(self, data):
+        track = parse_track(data)
+        self.parsed.append(len(track))
+        return track
+
+
+def point_rows(ride, track):
+    if len(track) < 2:
+        return []
+    return [(ride.activity_id, len(track))]
+
+
+def load_points(arguments, rides, parse, version=1):
+    return load_track_table(arguments, rides, "points.csv", COLUMNS, parse, point_rows, version)
+
+
+def test_tracks_without_rows_are_not_reread(tmp_path):
+    rides = recent_rides(4)
+    rides[1]["points"] = 1
+    rides[2]["data"] = b"<gpx>not a track"
+    export = write_export(str(tmp_path / "export"), rides)
+    arguments = command_arguments(export, str(tmp_path / "output"))
+    activities = parse_activities_csv(export)
+
+    first = CountingParse()
+    table = load_points(arguments, activities, first)
+    assert sorted(table.activity_id) == [rides[0]["id"], rides[3]["id"]]
+    assert len(first.parsed) == 3
+
+    second = CountingParse()
+    table = load_points(arguments, activities, second)
+    assert sorted(table.activity_id) == [rides[0]["id"], rides[3]["id"]]
+    assert second.parsed == []
+
+
+def test_replaced_track_or_new_version_is_reread(tmp_path):
+    rides = recent_rides(3)
+    export = write_export(str(tmp_path / "export"), rides)
+    arguments = command_arguments(export, str(tmp_path / "output"))
+    activities = parse_activities_csv(export)
+    load_points(arguments, activities, CountingParse())
+
+    track_filepath = os.path.join(export, activities[1].filename)
+    with open(track_filepath, "w") as track_file:
+        track_file.write(loop_gpx(rides[1]["date"], 120))
+    os.utime(track_filepath, ns=(os.stat(track_filepath).st_mtime_ns + 10 ** 9,) * 2)
+
+    replaced = CountingParse()
+    table = load_points(arguments, activities, replaced)
+    assert replaced.parsed == [120]
+    assert dict(zip(table.activity_id, table.points))[rides[1]["id"]] == 120
+    assert len(table) == 3
+
+    versioned = CountingParse()
+    load_points(arguments, activities, versioned, version=2)
+    assert len(versioned.parsed) == 3
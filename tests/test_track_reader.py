@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import gzip
+import zipfile
+import threading
+import pytest
+from conftest import write_export, recent_rides, loop_gpx
+from activity import parse_activities_csv
+from track_reader import TrackSource, read_tracks
+
+def read_all(source, activities, workers):
+    """Read every track on another thread, so that a hung reader fails the test rather than blocking it."""
+    results = []
+    reader = threading.Thread(target=lambda: results.extend(
+        activity.activity_id for activity, parsed in read_tracks(source, activities, workers=workers)), daemon=True)
+    reader.start()
+    reader.join(timeout=60)
+    assert not reader.is_alive(), "reading tracks did not finish"
+    return results
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_corrupt_gzip_track_is_skipped(tmp_path, workers):
+    rides = recent_rides(3)
+    # A valid gzip header around a damaged deflate stream, which fails with zlib.error rather than an OSError
+    corrupt = bytearray(gzip.compress(loop_gpx(rides[1]["date"], 300).encode("utf-8")))
+    corrupt[20:40] = b"\xff" * 20
+    rides[1]["data"] = bytes(corrupt)
+    export = write_export(str(tmp_path / "export"), rides, compress=True)
+    activities = parse_activities_csv(export)
+
+    source = TrackSource(export)
+    try:
+        assert read_all(source, activities, workers) == [rides[0]["id"], rides[2]["id"]]
+    finally:
+        source.close()
+
+
+def test_corrupt_archive_member_is_skipped(tmp_path):
+    rides = recent_rides(3)
+    export = write_export(str(tmp_path / "export"), rides, compress=True)
+    archive_filepath = str(tmp_path / "export.zip")
+    with zipfile.ZipFile(archive_filepath, "w", zipfile.ZIP_DEFLATED) as archive:
+        for directory, directories, filenames in os.walk(export):
+            for filename in filenames:
+                filepath = os.path.join(directory, filename)
+                archive.write(filepath, os.path.relpath(filepath, export))
+
+    # Flip bytes inside the second track's compressed data, so the member fails its crc check when read
+    with zipfile.ZipFile(archive_filepath) as archive:
+        member = archive.getinfo("activities/{}.gpx.gz".format(rides[1]["id"]))
+    with open(archive_filepath, "r+b") as archive_file:
+        archive_file.seek(member.header_offset + 30 + len(member.filename) + member.compress_size // 2)
+        archive_file.write(b"\xff\x00\xff\x00")
+
+    activities = parse_activities_csv(export)
+    source = TrackSource(archive_filepath)
+    try:
+        assert read_all(source, activities, workers=1) == [rides[0]["id"], rides[2]["id"]]
+    finally:
+        source.close()
@@ -0,0 +1,39 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import pandas as pd
+import pytest
+from conftest import command_arguments
+from activity import parse_activities_csv
+from training_load import (exponential_load, training_load, extend_training_load, load_training_load, daily_loads,
+    FITNESS_DAYS)
+
+def test_exponential_load_continues_from_its_initial_state():
+    loads = np.array([100.0, 0.0, 50.0, 0.0, 0.0])
+    expected = []
+    state = 20.0
+    for load in loads:
+        state += (load - state) / FITNESS_DAYS
+        expected.append(state)
+    assert exponential_load(loads, FITNESS_DAYS, 20.0) == pytest.approx(expected)
+
+
+def test_extending_matches_a_full_recompute():
+    days = pd.date_range("2024-01-01", periods=120, freq="D")
+    daily_load = pd.Series(np.random.default_rng(0).uniform(0, 150, len(days)), index=days, name="load")
+    full = training_load(daily_load)
+    extended = extend_training_load(training_load(daily_load.iloc[:90]), daily_load)
+    pd.testing.assert_frame_equal(extended, full)
+
+
+def test_cache_recomputes_in_full_when_an_earlier_day_changes(export, tmp_path):
+    arguments = command_arguments(export, str(tmp_path / "output"))
+    activities = parse_activities_csv(export, imperial=True)
+    first = load_training_load(arguments, activities)
+
+    activities[0].perceived_relative_effort = 500
+    changed = load_training_load(arguments, activities)
+    expected = training_load(daily_loads(activities))
+    pd.testing.assert_frame_equal(changed, expected, check_freq=False)
+    assert changed.fitness.iloc[-1] > first.fitness.iloc[-1]
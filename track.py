@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import pandas as pd
+from geo import step_distances
+from track_reader import TrackSource, parse_trackpoints
+
+class ActivityTrack:
+    """The track of a single activity, parsed once.
+    Derived columns are computed on first use and memoized, so every plot of an activity shares one parse.
+    Trackpoints without a time or position are dropped, and the rest are ordered by time.
+    """
+    def __init__(self, trackpoints, activity=None):
+        self.activity = activity
+        self.trackpoints = trackpoints.dropna(subset=["time", "latitude", "longitude"]) \
+            .sort_values("time", kind="mergesort") \
+            .reset_index(drop=True)
+        self.derived = {}
+
+
+    @classmethod
+    def load(cls, extract_filepath, activity):
+        """Read and parse the track referenced by an activity, relative to the extracted export."""
+        source = TrackSource(extract_filepath)
+        try:
+            data = source.read(activity.filename)
+        finally:
+            source.close()
+        return cls(parse_trackpoints(data), activity)
+
+
+    def __len__(self):
+        return len(self.trackpoints)
+
+
+    def memoize(self, name, derive):
+        if name not in self.derived:
+            self.derived[name] = derive()
+        return self.derived[name]
+
+
+    @property
+    def time(self):
+        return self.trackpoints.time
+
+
+    @property
+    def latitude(self):
+        return self.trackpoints.latitude.to_numpy()
+
+
+    @property
+    def longitude(self):
+        return self.trackpoints.longitude.to_numpy()
+
+
+    @property
+    def elevation(self):
+        return self.trackpoints.elevation.to_numpy()
+
+
+    @property
+    def heart_rate(self):
+        return self.trackpoints.heart_rate.to_numpy()
+
+
+    @property
+    def power(self):
+        return self.trackpoints.power.to_numpy()
+
+
+    @property
+    def seconds(self):
+        """Elapsed seconds since the first trackpoint."""
+        return self.memoize("seconds", lambda: (self.time - self.time.iloc[0]).dt.total_seconds().to_numpy()
+            if len(self) else np.zeros(0))
+
+
+    @property
+    def distance(self):
+        """Cumulative distance travelled in meters."""
+        return self.memoize("distance", lambda: np.cumsum(step_distances(self.latitude, self.longitude)))
+
+
+    @property
+    def speed(self):
+        """Speed in mph from each trackpoint to the next, or zero for the last point of each segment."""
+        return self.memoize("speed", self.derive_speed)
+
+
+    @property
+    def smoothed_speed(self):
+        """Speed averaged over a rolling window of 15 trackpoints."""
+        return self.memoize("smoothed_speed", lambda: pd.Series(self.speed).rolling(window=15).mean().to_numpy())
+
+
+    def derive_speed(self):
+        if len(self) == 0:
+            return np.zeros(0)
+        next_distances = np.append(np.diff(self.distance), 0)
+        next_seconds = np.append(np.diff(self.seconds), 0)
+        segments = self.trackpoints.segment.to_numpy()
+        same_segment = np.append(segments[1:] == segments[:-1], False)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            speed = np.where(same_segment & (next_seconds > 0), next_distances / next_seconds, 0)
+        return speed * 2.23694
+
+
+def parse_track(data):
+    """Parse raw track bytes into an activity track, for use as a track reader parse function."""
+    return ActivityTrack(parse_trackpoints(data))
@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import pandas as pd
+from activity import output_directory
+from track_reader import open_track_source, read_tracks, is_supported_track
+
+CACHE_DIRECTORY = "cache"
+PROCESSED_COLUMNS = ["activity_id", "signature", "version"]
+
+def load_track_table(arguments, rides, cache_filename, columns, parse, to_rows, version, parse_dates=None):
+    """Return a table derived from the track of each ride, cached on disk per activity.
+    Only rides whose tracks have not been processed yet have their tracks read, through the pipelined track
+    reader, using `parse` to turn raw track bytes into a result and `to_rows` to turn a ride and its result into
+    rows. The first column must be the activity id.
+    Alongside the table, the cache records every processed track with its signature and the version of the
+    derivation, including tracks which produced no rows or failed to parse, so those are not re-read on every
+    run. A replaced track, or a new version, has its rows derived again.
+    """
+    cache_directory = output_directory(arguments, CACHE_DIRECTORY)
+    cache_filepath = os.path.join(cache_directory, cache_filename)
+    processed_filepath = os.path.join(cache_directory, processed_filename(cache_filename))
+    if os.path.exists(cache_filepath) and os.path.exists(processed_filepath):
+        # Floats are read back exactly as written, so a cached table equals the table it was written from.
+        cached_table = pd.read_csv(cache_filepath, dtype={columns[0]: str}, parse_dates=parse_dates or False,
+            float_precision="round_trip")
+        processed_table = pd.read_csv(processed_filepath, dtype=str, keep_default_na=False)
+    else:
+        cached_table = pd.DataFrame(columns=columns)
+        processed_table = pd.DataFrame(columns=PROCESSED_COLUMNS)
+
+    processed = dict(zip(processed_table.activity_id, zip(processed_table.signature, processed_table.version)))
+    track_rides = [ride for ride in rides if is_supported_track(ride.filename)]
+    stale_rides = []
+    source = open_track_source(arguments.input)
+    try:
+        signatures = {ride.activity_id: source.signature(ride.filename) for ride in track_rides}
+        stale_rides = [ride for ride in track_rides
+            if processed.get(ride.activity_id) != (signatures[ride.activity_id], str(version))]
+        if stale_rides:
+            rows = []
+            for ride, parsed in read_tracks(source, stale_rides, parse=parse,
+                    prefetch=arguments.prefetch, workers=arguments.workers):
+                rows.extend(to_rows(ride, parsed))
+    finally:
+        source.close()
+
+    if stale_rides:
+        stale_ids = set(ride.activity_id for ride in stale_rides)
+        cached_table = cached_table[~cached_table[columns[0]].isin(stale_ids)]
+        new_table = pd.DataFrame(rows, columns=columns)
+        cached_table = pd.concat([table for table in (cached_table, new_table) if not table.empty] or [new_table],
+            ignore_index=True)
+        cached_table.to_csv(cache_filepath, index=False)
+
+        for activity_id in stale_ids:
+            processed[activity_id] = (signatures[activity_id], str(version))
+        pd.DataFrame([(activity_id, signature, processed_version)
+            for activity_id, (signature, processed_version) in processed.items()],
+            columns=PROCESSED_COLUMNS).to_csv(processed_filepath, index=False)
+
+    ride_ids = set(ride.activity_id for ride in rides)
+    return cached_table[cached_table[columns[0]].isin(ride_ids)].reset_index(drop=True)
+
+
+def processed_filename(cache_filename):
+    """Name of the file recording which tracks a cached table was derived from."""
+    return os.path.splitext(cache_filename)[0] + "-processed.csv"
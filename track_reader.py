@@ -0,0 +1,217 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import gzip
+import queue
+import datetime
+import threading
+import zipfile
+import collections
+import concurrent.futures
+import gpxpy
+import pandas as pd
+from activity import source_input_directory
+
+SUPPORTED_TRACK_EXTENSIONS = (".gpx", ".gpx.gz")
+END_OF_TRACKS = None
+
+def open_track_source(user_filepath):
+    """Open the track files of an export, reading members straight out of the archive when one was given."""
+    if user_filepath is not None and os.path.isfile(user_filepath) and zipfile.is_zipfile(user_filepath):
+        return TrackSource(user_filepath)
+    return TrackSource(source_input_directory(user_filepath))
+
+
+class TrackSource:
+    """Reads raw, decompressed track bytes from an extracted export directory or an export archive."""
+    def __init__(self, location):
+        self.location = location
+        self.archive = None
+        self.archive_lock = threading.Lock()
+        if os.path.isfile(location):
+            self.archive = zipfile.ZipFile(location, "r")
+
+
+    def read(self, filename):
+        if self.archive is not None:
+            with self.archive_lock:
+                data = self.archive.read(filename)
+        else:
+            with open(os.path.join(self.location, filename), "rb") as track_file:
+                data = track_file.read()
+
+        if filename.endswith(".gz"):
+            data = gzip.decompress(data)
+        return data
+
+
+    def signature(self, filename):
+        """Return a cheap signature of a track file which changes when the track is replaced, or "" if it is missing."""
+        try:
+            if self.archive is not None:
+                member = self.archive.getinfo(filename)
+                return "{:08x}-{}".format(member.CRC, member.file_size)
+            stat = os.stat(os.path.join(self.location, filename))
+            return "{}-{}".format(stat.st_mtime_ns, stat.st_size)
+        except (OSError, KeyError):
+            return ""
+
+
+    def close(self):
+        if self.archive is not None:
+            self.archive.close()
+
+
+def is_supported_track(filename):
+    return bool(filename) and filename.endswith(SUPPORTED_TRACK_EXTENSIONS)
+
+
+def parse_trackpoints(data):
+    """Parse raw gpx bytes into a dataframe with a row per trackpoint."""
+    gpx = gpxpy.parse(data.decode("utf-8"))
+
+    segments = []
+    times = []
+    latitudes = []
+    longitudes = []
+    elevations = []
+    heart_rates = []
+    powers = []
+    segment_index = 0
+    for track in gpx.tracks:
+        for segment in track.segments:
+            for point in segment.points:
+                segments.append(segment_index)
+                times.append(datetime.datetime.fromisoformat(point.time.isoformat()) if point.time else None)
+                latitudes.append(point.latitude)
+                longitudes.append(point.longitude)
+                elevations.append(point.elevation)
+                heart_rates.append(extension_value(point.extensions, "hr"))
+                powers.append(extension_value(point.extensions, "power"))
+            segment_index += 1
+
+    return pd.DataFrame(data={
+        "segment": segments,
+        "time": pd.to_datetime(times, utc=True),
+        "latitude": pd.Series(latitudes, dtype=float),
+        "longitude": pd.Series(longitudes, dtype=float),
+        "elevation": pd.Series(elevations, dtype=float),
+        "heart_rate": pd.Series(heart_rates, dtype=float),
+        "power": pd.Series(powers, dtype=float)
+    })
+
+
+def extension_value(extensions, name):
+    """Find a numeric value by tag name within gpx trackpoint extensions, ignoring xml namespaces.
+    Covers both garmin style nested extensions (hr) and flat ones (power).
+    """
+    for extension in extensions:
+        for element in extension.iter():
+            if element.tag.rsplit("}", 1)[-1] == name and element.text:
+                try:
+                    return float(element.text)
+                except ValueError:
+                    return None
+    return None
+
+
+def read_tracks(source, activities, parse=parse_trackpoints, prefetch=8, workers=None):
+    """Yield (activity, parsed track) pairs, in activity order, for every activity with a supported track.
+    Track files are read and decompressed on a background thread into a queue holding at most `prefetch`
+    tracks, so reading overlaps with parsing. With more than one worker, parsing is spread over a process
+    pool, in which case `parse` must be a picklable module level function. Tracks which cannot be read or
+    parsed are reported and skipped.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    track_activities = [activity for activity in activities if is_supported_track(activity.filename)]
+
+    raw_tracks = queue.Queue(maxsize=max(prefetch, 1))
+    stopped = threading.Event()
+    reader = threading.Thread(target=read_ahead, args=(source, track_activities, raw_tracks, stopped), daemon=True)
+    reader.start()
+
+    executor = concurrent.futures.ProcessPoolExecutor(workers) if workers > 1 else None
+    in_flight = collections.deque()
+    try:
+        while True:
+            item = raw_tracks.get()
+            if item is END_OF_TRACKS:
+                break
+
+            activity, data, error = item
+            if error is not None:
+                print("Unable to read track {}: {}".format(activity.filename, error))
+                continue
+
+            if executor is None:
+                parsed = parse_or_report(activity, parse, data)
+                if parsed is not None:
+                    yield activity, parsed
+                continue
+
+            in_flight.append((activity, executor.submit(parse, data)))
+            while in_flight and (len(in_flight) > workers * 2 or in_flight[0][1].done()):
+                activity, future = in_flight.popleft()
+                parsed = future_or_report(activity, future)
+                if parsed is not None:
+                    yield activity, parsed
+
+        while in_flight:
+            activity, future = in_flight.popleft()
+            parsed = future_or_report(activity, future)
+            if parsed is not None:
+                yield activity, parsed
+    finally:
+        stopped.set()
+        for activity, future in in_flight:
+            future.cancel()
+        if executor is not None:
+            executor.shutdown(wait=True)
+        reader.join()
+
+
+def read_ahead(source, activities, raw_tracks, stopped):
+    """Read each activity track into the queue, blocking while the queue is full.
+    Any failure to read a track is passed along with it, and the end of the tracks is always signalled,
+    so that the consumer is never left waiting on a reader which has died.
+    """
+    try:
+        for activity in activities:
+            if stopped.is_set():
+                return
+            try:
+                item = (activity, source.read(activity.filename), None)
+            except Exception as exception:
+                item = (activity, None, exception)
+            if not put_unless_stopped(raw_tracks, item, stopped):
+                return
+    finally:
+        put_unless_stopped(raw_tracks, END_OF_TRACKS, stopped)
+
+
+def put_unless_stopped(raw_tracks, item, stopped):
+    while not stopped.is_set():
+        try:
+            raw_tracks.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def parse_or_report(activity, parse, data):
+    try:
+        return parse(data)
+    except Exception as exception:
+        print("Unable to parse track {}: {}".format(activity.filename, exception))
+        return None
+
+
+def future_or_report(activity, future):
+    try:
+        return future.result()
+    except Exception as exception:
+        print("Unable to parse track {}: {}".format(activity.filename, exception))
+        return None
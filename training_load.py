@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import datetime
+import numpy as np
+import pandas as pd
+from scipy.signal import lfilter
+from activity import output_directory
+from track_cache import CACHE_DIRECTORY
+
+FITNESS_DAYS = 42
+FATIGUE_DAYS = 7
+TRAINING_LOAD_COLUMNS = ["load", "fitness", "fatigue", "form"]
+TRAINING_LOAD_CACHE_FILENAME = "training-load.csv"
+
+def activity_loads(activities):
+    """Estimate the training load of each activity.
+    Perceived relative effort is used where recorded. Otherwise load is moving hours x intensity squared x 100,
+    with intensity being average speed relative to the median average speed for that activity type.
+    """
+    speeds = pd.DataFrame(data={
+        "activity_type": [activity.activity_type for activity in activities],
+        "average_speed": [activity.average_speed for activity in activities]
+    })
+    reference_speeds = speeds[speeds.average_speed > 0].groupby("activity_type").average_speed.median()
+
+    loads = []
+    for activity in activities:
+        if activity.perceived_relative_effort:
+            loads.append(activity.perceived_relative_effort)
+            continue
+        reference_speed = reference_speeds.get(activity.activity_type)
+        intensity = activity.average_speed / reference_speed if reference_speed else 1.0
+        loads.append(activity.moving_time / 3600 * intensity ** 2 * 100)
+    return loads
+
+
+def daily_loads(activities, end_date=None):
+    """Sum activity loads into a series with one entry per day, from the first activity through the end date."""
+    end_date = end_date or datetime.date.today()
+    if not activities:
+        return pd.Series(dtype=float, name="load")
+    load_df = pd.DataFrame(data={
+        "date": [activity.date.date() for activity in activities],
+        "load": activity_loads(activities)
+    })
+    days = pd.date_range(min(load_df.date.min(), end_date), end_date, freq="D")
+    daily = load_df.groupby(pd.to_datetime(load_df.date)).load.sum()
+    return daily.reindex(days, fill_value=0.0).rename("load")
+
+
+def exponential_load(loads, days, initial=0.0):
+    """Exponentially weighted load with the given time constant, as a single first order filter over all days."""
+    alpha = 1.0 / days
+    filtered, final_state = lfilter([alpha], [1.0, alpha - 1.0], loads, zi=[(1.0 - alpha) * initial])
+    return filtered
+
+
+def training_load(daily_load, initial_fitness=0.0, initial_fatigue=0.0):
+    """Compute fitness (chronic load), fatigue (acute load) and form over a daily load series.
+    Form on a given day is the prior day's fitness less its fatigue.
+    """
+    if daily_load.empty:
+        return pd.DataFrame(columns=TRAINING_LOAD_COLUMNS, index=daily_load.index, dtype=float)
+    loads = daily_load.to_numpy(dtype=float)
+    fitness = exponential_load(loads, FITNESS_DAYS, initial_fitness)
+    fatigue = exponential_load(loads, FATIGUE_DAYS, initial_fatigue)
+    form = np.concatenate([[initial_fitness - initial_fatigue], fitness[:-1] - fatigue[:-1]])
+    return pd.DataFrame(data={
+        "load": loads,
+        "fitness": fitness,
+        "fatigue": fatigue,
+        "form": form
+    }, index=daily_load.index)
+
+
+def extend_training_load(previous, daily_load):
+    """Continue a previously computed training load over the days of daily_load after its last day."""
+    new_days = daily_load[daily_load.index > previous.index[-1]]
+    if new_days.empty:
+        return previous
+    return pd.concat([previous, training_load(new_days, previous.fitness.iloc[-1], previous.fatigue.iloc[-1])])
+
+
+def load_training_load(arguments, activities):
+    """Return training load for every day of the activity history, cached between runs.
+    While the loads of previously computed days are unchanged, only newly arrived days are filtered.
+    """
+    daily_load = daily_loads(activities)
+    cache_filepath = os.path.join(output_directory(arguments, CACHE_DIRECTORY), TRAINING_LOAD_CACHE_FILENAME)
+
+    result = None
+    if os.path.exists(cache_filepath):
+        cached = pd.read_csv(cache_filepath, index_col=0, parse_dates=True, float_precision="round_trip")
+        cached.index = cached.index.astype(daily_load.index.dtype)
+        known_days = daily_load[daily_load.index <= cached.index[-1]] if not cached.empty else None
+        if known_days is not None and known_days.index.equals(cached.index) and \
+                np.allclose(known_days.to_numpy(), cached.load.to_numpy()):
+            result = extend_training_load(cached, daily_load)
+
+    if result is None:
+        result = training_load(daily_load)
+    result.to_csv(cache_filepath)
+    return result